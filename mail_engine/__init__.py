@@ -0,0 +1,131 @@
+"""
+Headless core of the Mail Content Automator.
+
+Everything in this package is pure Python and safe to import without a display,
+Tk, Outlook or pandas, so batch jobs can render emails on a Linux worker. The Tk
+application in mail_content_automator.py is a thin caller of this package.
+"""
+
+from .attachments import AttachmentInfo, AttachmentLimitError, AttachmentManager, AttachmentScan, ScanSummary, hash_file, iter_files
+from .compose import (
+    DEFAULT_BODY,
+    DEFAULT_GREETING,
+    DEFAULT_SIGNATURE,
+    ComposedEmail,
+    Signature,
+    compose_email,
+    iter_email_html,
+    iter_email_plain_text,
+)
+from .directory import Contact, RecipientDirectory, load_directory, normalize_address
+from .groups import GroupBook, chunk_recipients, load_aliases
+from .metrics import Metrics
+from .mime import iter_message, message_bytes, write_message
+from .library import LibraryTemplate, TemplateLibrary
+from .merge import (
+    MergeReport,
+    MergeStatus,
+    fill_placeholders,
+    render_merge,
+    send_merge,
+)
+from .message import MailItem, make_mail_item
+from .render import (
+    MarkupSizes,
+    describe_sizes,
+    inline_table_styles,
+    iter_html_table,
+    iter_plain_table,
+    markup_sizes,
+    table_to_html,
+    table_to_plain_text,
+    write_chunks,
+)
+from .offload import OffloadPolicy, compose_with_offload
+from .outbox import Outbox, RateLimiter
+from .outlook import OutlookSession, OutlookTransport
+from .preview import PreviewRenderer
+from .send_queue import CallbackPump, SendJob, SendQueue
+from .tabular import TableModel, TableView, parse_table, write_delimited
+from .template import Template, TemplateError, compile_template, load_template, render_template, table_context
+from .transport import (
+    FileTransport,
+    MemoryTransport,
+    SMTPTransport,
+    Transport,
+    TransportError,
+    transport_from_url,
+)
+
+__all__ = [
+    "AttachmentInfo",
+    "AttachmentLimitError",
+    "AttachmentManager",
+    "AttachmentScan",
+    "DEFAULT_BODY",
+    "DEFAULT_GREETING",
+    "DEFAULT_SIGNATURE",
+    "FileTransport",
+    "GroupBook",
+    "MemoryTransport",
+    "OffloadPolicy",
+    "Outbox",
+    "OutlookSession",
+    "OutlookTransport",
+    "PreviewRenderer",
+    "RecipientDirectory",
+    "RateLimiter",
+    "ScanSummary",
+    "SMTPTransport",
+    "SendJob",
+    "SendQueue",
+    "Transport",
+    "TableModel",
+    "TableView",
+    "TemplateLibrary",
+    "Template",
+    "TemplateError",
+    "TransportError",
+    "CallbackPump",
+    "ComposedEmail",
+    "Contact",
+    "Signature",
+    "LibraryTemplate",
+    "MailItem",
+    "MarkupSizes",
+    "MergeReport",
+    "MergeStatus",
+    "Metrics",
+    "chunk_recipients",
+    "compile_template",
+    "compose_email",
+    "compose_with_offload",
+    "describe_sizes",
+    "fill_placeholders",
+    "hash_file",
+    "inline_table_styles",
+    "iter_email_html",
+    "iter_email_plain_text",
+    "iter_files",
+    "iter_html_table",
+    "iter_message",
+    "iter_plain_table",
+    "load_aliases",
+    "load_directory",
+    "load_template",
+    "make_mail_item",
+    "markup_sizes",
+    "message_bytes",
+    "normalize_address",
+    "parse_table",
+    "render_merge",
+    "render_template",
+    "send_merge",
+    "table_context",
+    "table_to_html",
+    "table_to_plain_text",
+    "transport_from_url",
+    "write_chunks",
+    "write_delimited",
+    "write_message",
+]
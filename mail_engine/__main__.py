@@ -0,0 +1,8 @@
+"""Run the command-line batch runner: python -m mail_engine --help"""
+
+import sys
+
+from .cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""
+Attachment bookkeeping.
+
+AttachmentManager keeps the attachment list as an ordered set, so membership is a
+hash lookup rather than a scan of the list widget. Each file is hashed once with
+a streaming SHA-256 (cached by path, size and mtime), which lets the same content
+added under two names be recognised as a duplicate. Size limits are checked
+before a message is queued instead of failing at the server.
+
+For transports that build MIME themselves (SMTP, .eml files), encoded_part() caches
+the encoded attachment part by content digest, so a bulk send that attaches the
+same 20 MB PDF to every message reads and base64-encodes it once. Files too big to
+cache are streamed from disk by mime.iter_attachment_part() on every send.
+
+AttachmentScan adds dropped files and folders on a background thread: folders are
+walked recursively through include/exclude glob rules, files are stat'ed and
+hashed on a thread pool, and the added files are reported in batches.
+"""
+
+import fnmatch
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+from .mime import guess_content_type, iter_attachment_part
+
+HASH_CHUNK_BYTES = 1 << 20  # Read files in 1 MB chunks so hashing large files uses constant memory
+
+# What is known about one file; digest is the hex SHA-256 of its contents
+AttachmentInfo = namedtuple("AttachmentInfo", ["path", "name", "size", "mtime_ns", "digest", "content_type"])
+
+class AttachmentLimitError(ValueError):
+    """Attachments are missing or exceed a size limit."""
+
+def hash_file(path, chunk_bytes=HASH_CHUNK_BYTES):
+    """Return the hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def encoded_size(size):
+    """Bytes a file of size bytes takes in a message once base64-encoded (76-character lines plus CRLF)."""
+    return -(-size // 57) * 78
+
+def format_bytes(size):
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:,.0f} {unit}" if unit == "bytes" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+class AttachmentManager:
+    """
+    The attachment list plus caches of file hashes and encoded MIME parts.
+    Args:
+        max_file_bytes (int): Largest single attachment; None for no limit.
+        max_total_bytes (int): Largest encoded size of all attachments of one message; None for no limit.
+        part_cache_bytes (int): Memory allowed for cached encoded MIME parts; a file whose part would
+            take more than a quarter of it is streamed instead of cached.
+        info_cache_size (int): File hashes kept, least recently used dropped first.
+        cache_part (callable): Called with a path; returning False streams that file's part instead of
+            caching it, e.g. for one-off files such as offloaded tables.
+    """
+
+    def __init__(self, max_file_bytes=None, max_total_bytes=None, part_cache_bytes=64 * 1024 * 1024,
+                 info_cache_size=4096, cache_part=None):
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.part_cache_bytes = part_cache_bytes
+        self.info_cache_size = info_cache_size
+        self.cache_part = cache_part
+        self._lock = threading.RLock()  # Workers hash and send while the Tk thread edits the list
+        self._items = OrderedDict()  # normalised path -> AttachmentInfo
+        self._digests = {}  # digest -> normalised path of the attachment holding that content
+        self._infos = OrderedDict()  # (path, size, mtime_ns) -> AttachmentInfo, least recent first
+        self._parts = OrderedDict()  # (digest, name, content type) -> encoded part bytes, least recent first
+        self._parts_bytes = 0
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    # ------------------- File Information -------------------
+
+    def info(self, path):
+        """
+        Return the AttachmentInfo of path, hashing it only if it is new or has changed.
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        stat = os.stat(path)
+        key = (self._key(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._infos.get(key)
+            if cached is not None:
+                self._infos.move_to_end(key)
+                return cached
+        info = AttachmentInfo(path, os.path.basename(path), stat.st_size, stat.st_mtime_ns, hash_file(path),
+                              guess_content_type(path))
+        metrics.increment("attachment_bytes_hashed", info.size)
+        with self._lock:
+            self._infos[key] = info
+            while len(self._infos) > self.info_cache_size:
+                self._infos.popitem(last=False)  # Edited files and one-off tables don't pile up
+        return info
+
+    # ------------------- The Attachment List -------------------
+
+    def add(self, path):
+        """
+        Add a file to the list. Returns (AttachmentInfo, None) when added, or (info, reason) when it was
+        skipped because the same path or the same content is already attached.
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        key = self._key(path)
+        with self._lock:
+            if key in self._items:
+                return self._items[key], "already attached"
+        info = self.info(path)
+        with self._lock:
+            if key in self._items:
+                return self._items[key], "already attached"
+            existing = self._digests.get(info.digest)
+            if existing is not None:
+                return info, f"same content as {self._items[existing].name}"
+            self._items[key] = info
+            self._digests[info.digest] = key
+        return info, None
+
+    def remove(self, path):
+        with self._lock:
+            info = self._items.pop(self._key(path), None)
+            if info is not None:
+                self._digests.pop(info.digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._digests.clear()
+
+    def paths(self):
+        """Attached paths in the order they were added."""
+        with self._lock:
+            return [info.path for info in self._items.values()]
+
+    def __contains__(self, path):
+        return self._key(path) in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(info.size for info in self._items.values())
+
+    # ------------------- Limits -------------------
+
+    def validate(self, paths=None):
+        """
+        Check that paths (default: the attachment list) exist and fit the size limits.
+        Returns:
+            list of AttachmentInfo for paths, in order.
+        Raises:
+            AttachmentLimitError: Listing every missing or oversized file.
+        """
+        paths = self.paths() if paths is None else paths
+        infos, problems = [], []
+        for path in paths:
+            try:
+                info = self.info(path)
+            except OSError:
+                problems.append(f"Attachment not found: {path}")
+                continue
+            if self.max_file_bytes is not None and info.size > self.max_file_bytes:
+                problems.append(f"{info.name} is {format_bytes(info.size)}; the limit is {format_bytes(self.max_file_bytes)}.")
+            infos.append(info)
+        total = sum(encoded_size(info.size) for info in infos)
+        if self.max_total_bytes is not None and total > self.max_total_bytes:
+            problems.append(f"The attachments add {format_bytes(total)} to the message; "
+                            f"the limit is {format_bytes(self.max_total_bytes)}.")
+        if problems:
+            raise AttachmentLimitError("\n".join(problems))
+        return infos
+
+    # ------------------- Encoded Parts -------------------
+
+    def encoded_part(self, path):
+        """
+        Return the base64-encoded attachment part (headers and body) for path as an iterable of
+        bytes, reused across messages while the file is unchanged. Large files are streamed.
+        """
+        info = self.info(path)
+        key = (info.digest, info.name, info.content_type)
+        with self._lock:
+            cached = self._parts.get(key)
+            if cached is not None:
+                self._parts.move_to_end(key)
+                return (cached,)
+        if encoded_size(info.size) > self.part_cache_bytes // 4:
+            return iter_attachment_part(path, info.name, info.content_type)  # Flat memory for very large files
+        if self.cache_part is not None and not self.cache_part(path):
+            return iter_attachment_part(path, info.name, info.content_type)
+        part = b"".join(iter_attachment_part(path, info.name, info.content_type))
+        with self._lock:
+            if key not in self._parts:
+                self._parts[key] = part
+                self._parts_bytes += len(part)
+                while self._parts_bytes > self.part_cache_bytes:
+                    _, evicted = self._parts.popitem(last=False)
+                    self._parts_bytes -= len(evicted)
+        logging.debug("Encoded attachment %s (%s)", info.name, format_bytes(info.size))
+        return (part,)
+
+# ------------------- Background Scans -------------------
+
+# Office lock files, OS metadata and hidden files are never useful attachments
+DEFAULT_EXCLUDE = (".*", "~$*", "Thumbs.db", "desktop.ini")
+
+# Outcome of a scan: files added, skipped as duplicates or by the rules, and unreadable
+ScanSummary = namedtuple("ScanSummary", ["added", "duplicates", "excluded", "errors", "seconds"])
+
+def _matches(name, relative, patterns):
+    """True when a pattern matches the file name or its path relative to the dropped folder."""
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative, pattern) for pattern in patterns)
+
+def iter_files(paths, include=("*",), exclude=DEFAULT_EXCLUDE, is_cancelled=None):
+    """
+    Yield (path, None) for every file under paths that passes the rules, and (path, reason) for
+    files and folders that were left out. Folders are walked recursively without following links.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path, None  # Files picked one by one are attached regardless of the rules
+            continue
+        if not os.path.isdir(path):
+            yield path, "not found"
+            continue
+        pending = [path]
+        while pending:
+            if is_cancelled is not None and is_cancelled():
+                return
+            folder = pending.pop()
+            try:
+                entries = sorted(os.scandir(folder), key=lambda entry: entry.name.lower())
+            except OSError as e:
+                yield folder, str(e)
+                continue
+            subfolders = []
+            for entry in entries:
+                relative = os.path.relpath(entry.path, path).replace(os.sep, "/")
+                if _matches(entry.name, relative, exclude):
+                    yield entry.path, "excluded"
+                elif entry.is_dir(follow_symlinks=False):
+                    subfolders.append(entry.path)
+                elif entry.is_file() and _matches(entry.name, relative, include):
+                    yield entry.path, None
+                else:
+                    yield entry.path, "excluded"
+            pending.extend(reversed(subfolders))  # Depth-first, in name order
+
+class AttachmentScan:
+    """
+    Add files and folders to an AttachmentManager on a background thread.
+    Args:
+        on_batch (callable): Called with a list of AttachmentInfos each time batch_size files were added.
+        on_done (callable): Called with the ScanSummary at the end.
+    Both are called on the scan thread; a GUI should hand them to its CallbackPump.
+    """
+
+    def __init__(self, manager, paths, include=("*",), exclude=DEFAULT_EXCLUDE, workers=8, batch_size=100,
+                 on_batch=None, on_done=None):
+        self.manager = manager
+        self.paths = list(paths)
+        self.include = tuple(include) or ("*",)
+        self.exclude = tuple(exclude)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="attachment-scan", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _info(self, path):
+        try:
+            return self.manager.info(path)
+        except OSError as e:
+            return e
+
+    def _run(self):
+        started = time.perf_counter()
+        added = duplicates = excluded = errors = 0
+        batch = []
+
+        def add(path, info):
+            """Add one hashed file, in walk order so the list order is stable."""
+            nonlocal added, duplicates, errors, batch
+            if isinstance(info, OSError):
+                errors += 1
+                logging.warning("Cannot attach %s: %s", path, info)
+                return
+            info, skipped = self.manager.add(path)
+            if skipped:
+                duplicates += 1
+                return
+            added += 1
+            batch.append(info)
+            if len(batch) >= self.batch_size:
+                self._emit(batch)
+                batch = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # Files are stat'ed and hashed while the walk goes on; a bounded window of them is in flight,
+            # so the first batches arrive before a large folder has been walked to the end
+            pending = deque()
+            window = max(self.workers * 4, self.batch_size)
+            for path, reason in iter_files(self.paths, self.include, self.exclude, self._cancelled.is_set):
+                if self._cancelled.is_set():
+                    break
+                if reason is None:
+                    pending.append((path, pool.submit(self._info, path)))
+                    if len(pending) >= window:
+                        path, future = pending.popleft()
+                        add(path, future.result())
+                elif reason == "excluded":
+                    excluded += 1
+                else:
+                    errors += 1
+                    logging.warning("Cannot attach %s: %s", path, reason)
+            while pending and not self._cancelled.is_set():
+                path, future = pending.popleft()
+                add(path, future.result())
+            if self._cancelled.is_set():
+                pool.shutdown(cancel_futures=True)
+        if batch:
+            self._emit(batch)
+        summary = ScanSummary(added, duplicates, excluded, errors, time.perf_counter() - started)
+        metrics.REGISTRY.observe("attach", summary.seconds)
+        metrics.increment("attachments_added", added)
+        logging.info("Attachment scan: %d added, %d duplicates, %d excluded, %d errors in %.1fs",
+                     added, duplicates, excluded, errors, summary.seconds)
+        if self.on_done is not None:
+            self.on_done(summary)
+
+    def _emit(self, batch):
+        if self.on_batch is not None:
+            self.on_batch(batch)
@@ -0,0 +1,279 @@
+"""
+Benchmarks for the paste, compose, preview and send paths.
+
+    python -m mail_engine.bench                        # all sizes and shapes
+    python -m mail_engine.bench --sizes 10,1000 --output results.json
+    python -m mail_engine.bench --baseline results.json  # exit status 1 on a regression
+
+Each case is a synthetic table (narrow, wide or unicode-heavy) copied to a
+FakeClipboard and taken through the same engine calls the GUI makes:
+
+    paste    clipboard text -> TableModel (parse_table)
+    compose  the email as sent, with large tables offloaded (compose_with_offload)
+    render   the full table inline, without offloading (compose_email)
+    preview  a first preview of the pasted table (PreviewRenderer)
+    send     building the MIME message through a MemoryTransport
+    merge    one message per row, up to --merge-rows rows (render_merge + send_merge)
+
+Every stage reports its best and median time over --repeat runs, throughput
+(rows per second, or messages per second for send and merge), output size and the
+peak memory traced in one extra run.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+from .compose import compose_email
+from .fakes import FakeClipboard
+from .merge import render_merge, send_merge
+from .message import make_mail_item
+from .offload import OffloadPolicy, compose_with_offload
+from .preview import PreviewRenderer
+from .tabular import parse_table
+from .transport import MemoryTransport
+
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+SHAPES = ("narrow", "wide", "unicode")
+STAGES = ("paste", "compose", "render", "preview", "send", "merge")
+
+SUBJECT = "Deliveries for week {week}"
+GREETING = "Hi team,"
+BODY = "Please see below for the {row_count} orders expected this week.\n\nThe table is sorted by arrival date."
+
+# Timings below this many seconds apart are noise, whatever their ratio
+NOISE_SECONDS = 0.0005
+
+# Stages that measure whole messages, so their throughput is counted in messages rather than table rows
+MESSAGE_STAGES = ("send", "merge")
+
+# One measured stage of one case; count is the rows or messages (unit) one run processes
+StageResult = namedtuple("StageResult", ["count", "unit", "seconds", "median", "per_second", "output_bytes", "peak_bytes"])
+
+# A stage that got slower or hungrier than the baseline allows
+Regression = namedtuple("Regression", ["case", "stage", "metric", "baseline", "current", "ratio"])
+
+# ------------------- Synthetic Tables -------------------
+
+SUPPLIERS = ("Acme Logistics", "Northwind", "Contoso Freight", "Fabrikam", "Tailspin", "Wide World Importers")
+UNICODE_NAMES = ("Zoë Ångström", "Łukasz Żółć", "Søren Kierkegård", "山田 太郎", "Иван Петров", "Ηλέκτρα",
+                 "محمد علي", "Nguyễn Văn A", "José Müller 🚚", "Chloé <R&D>")
+UNICODE_CITIES = ("Zürich", "Kraków", "São Paulo", "東京", "Москва", "Αθήνα", "القاهرة", "Hà Nội")
+
+def _narrow_row(rng, index):
+    return (str(100000 + index), rng.choice(SUPPLIERS), f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            str(rng.randint(1, 500)), f"{rng.uniform(10, 10000):.2f}")
+
+def synthetic_table(rows, shape="narrow", seed=1):
+    """
+    Return tab-separated text with a header and rows data rows, as Excel puts on the clipboard.
+    Shapes: narrow (5 columns), wide (30 columns) or unicode (accents, CJK, RTL, emoji and HTML characters).
+    """
+    rng = random.Random(seed)
+    if shape == "narrow":
+        header = ["PO Number", "Supplier", "ETA", "Qty", "Value"]
+        make = _narrow_row
+    elif shape == "wide":
+        header = [f"{name} {group}" for group in range(1, 7) for name in ("PO Number", "Supplier", "ETA", "Qty", "Value")]
+        make = lambda rng, index: sum((_narrow_row(rng, index) for _ in range(6)), ())
+    elif shape == "unicode":
+        header = ["PO Number", "Contact", "City", "Notes", "Qty"]
+        make = lambda rng, index: (str(100000 + index), rng.choice(UNICODE_NAMES), rng.choice(UNICODE_CITIES),
+                                   " ".join(rng.choice(UNICODE_NAMES).split()[::-1]) + " – “urgent” ≥ 2 pallets",
+                                   str(rng.randint(1, 500)))
+    else:
+        raise ValueError(f"Unknown table shape: {shape}. Choose one of {', '.join(SHAPES)}.")
+    lines = ["\t".join(header)]
+    lines.extend("\t".join(make(rng, index)) for index in range(rows))
+    return "\r\n".join(lines) + "\r\n"
+
+# ------------------- Stages -------------------
+
+def read_clipboard(clipboard):
+    """Read clipboard text the way the GUI does with win32clipboard."""
+    clipboard.OpenClipboard()
+    try:
+        if clipboard.IsClipboardFormatAvailable(clipboard.CF_UNICODETEXT):
+            return clipboard.GetClipboardData(clipboard.CF_UNICODETEXT)
+        return clipboard.GetClipboardData(clipboard.CF_TEXT).decode("utf-8")
+    finally:
+        clipboard.CloseClipboard()
+
+def _measure(run, repeat):
+    """Return (best seconds, median seconds, output bytes, peak traced bytes) of run()."""
+    timings = []
+    output = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = run()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(timings), statistics.median(timings), output, peak
+
+def run_case(rows, shape, repeat=3, merge_rows=1000, stages=STAGES, workdir=None):
+    """Benchmark one synthetic table; returns {stage: StageResult}."""
+    if workdir is None:
+        with tempfile.TemporaryDirectory(prefix="mail-bench-") as workdir:
+            return run_case(rows, shape, repeat, merge_rows, stages, workdir)
+    clipboard = FakeClipboard(synthetic_table(rows, shape))
+    model = parse_table(read_clipboard(clipboard))
+    policy = OffloadPolicy(directory=os.path.join(workdir, "tables"))
+    composed, table_attachments = compose_with_offload(SUBJECT, GREETING, BODY, model.columns, model.view(),
+                                                       policy=policy, compact=True)
+    item = make_mail_item(composed, ["team@example.com"], ["lead@example.com"], table_attachments)
+
+    text_bytes = len(clipboard.text.encode("utf-8"))
+
+    def paste():
+        parse_table(read_clipboard(clipboard))
+        return text_bytes
+
+    def compose():
+        composed, attachments = compose_with_offload(SUBJECT, GREETING, BODY, model.columns, model.view(),
+                                                     policy=policy, compact=True)
+        return len(composed.html_content.encode("utf-8")) + sum(os.path.getsize(path) for path in attachments)
+
+    def render():
+        return len(compose_email(SUBJECT, GREETING, BODY, model.columns, model.view(), compact=True).html_content.encode("utf-8"))
+
+    def preview():
+        composed = PreviewRenderer().compose(SUBJECT, GREETING, BODY, model.columns, model.view(), table_key=model.version)
+        return len(composed.html_content.encode("utf-8"))
+
+    def send():
+        transport = MemoryTransport(build_mime=True)
+        transport.send(item)
+        return len(transport.messages[0])
+
+    merged = min(rows, merge_rows)
+
+    def merge():
+        transport = MemoryTransport(build_mime=True)
+        items = render_merge(SUBJECT + " - PO {PO Number}", "Hi {PO Number},", BODY, model.columns,
+                             model.view(0, merged), to=["team@example.com"], compact=True)
+        send_merge(items, transport.send)
+        return sum(len(message) for message in transport.messages)
+
+    runs = {"paste": paste, "compose": compose, "render": render, "preview": preview, "send": send, "merge": merge}
+    results = {}
+    for stage in stages:
+        count = {"send": 1, "merge": merged}.get(stage, rows)
+        unit = "msg" if stage in MESSAGE_STAGES else "rows"
+        best, median, output, peak = _measure(runs[stage], repeat)
+        results[stage] = StageResult(count, unit, best, median, count / best if best else 0.0, output, peak)
+    return results
+
+def run_suite(sizes=DEFAULT_SIZES, shapes=SHAPES, repeat=3, merge_rows=1000, stages=STAGES, report=None):
+    """
+    Run every size and shape. Returns a JSON-ready dict with the environment and
+    results[case][stage] = StageResult fields, where case is e.g. "wide-10000".
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="mail-bench-") as workdir:
+        for shape in shapes:
+            for rows in sizes:
+                case = f"{shape}-{rows}"
+                case_results = run_case(rows, shape, repeat, merge_rows, stages, workdir)
+                results[case] = {stage: result._asdict() for stage, result in case_results.items()}
+                if report is not None:
+                    report(case, case_results)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+# ------------------- Baselines -------------------
+
+def compare(current, baseline, tolerance=0.25):
+    """
+    Return the Regressions of current against baseline (both run_suite() dicts): stages whose
+    best time or peak memory grew by more than tolerance. Cases missing from either are skipped.
+    """
+    regressions = []
+    for case, stages in current["results"].items():
+        for stage, result in stages.items():
+            before = baseline.get("results", {}).get(case, {}).get(stage)
+            if before is None:
+                continue
+            for metric, floor in (("seconds", NOISE_SECONDS), ("peak_bytes", 0)):
+                old, new = before[metric], result[metric]
+                if new - old > floor and new > old * (1 + tolerance):
+                    regressions.append(Regression(case, stage, metric, old, new, new / old if old else float("inf")))
+    return regressions
+
+def format_case(case, results):
+    lines = []
+    for stage, result in results.items():
+        lines.append(f"{case:<16} {stage:<8} {result.seconds * 1000:>10.2f} ms {result.median * 1000:>10.2f} ms "
+                     f"{result.per_second:>12,.0f} {result.unit + '/s':<6} {result.output_bytes / 1024:>10,.0f} KB "
+                     f"{result.peak_bytes / 1024 / 1024:>8.1f} MB peak")
+    return "\n".join(lines)
+
+def format_regression(regression):
+    if regression.metric == "seconds":
+        old, new = f"{regression.baseline * 1000:.2f} ms", f"{regression.current * 1000:.2f} ms"
+    else:
+        old, new = f"{regression.baseline / 1024 / 1024:.1f} MB", f"{regression.current / 1024 / 1024:.1f} MB"
+    return f"REGRESSION {regression.case} {regression.stage} {regression.metric}: {old} -> {new} ({regression.ratio:.2f}x)"
+
+# ------------------- Command Line -------------------
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+def _name_list(choices):
+    def parse(value):
+        names = [part.strip() for part in value.split(",") if part.strip()]
+        unknown = [name for name in names if name not in choices]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown: {', '.join(unknown)} (choose from {', '.join(choices)})")
+        return names
+    return parse
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m mail_engine.bench", description="Benchmark paste, compose and send.")
+    parser.add_argument("--sizes", type=_int_list, default=list(DEFAULT_SIZES), help="Row counts, e.g. 10,1000,100000")
+    parser.add_argument("--shapes", type=_name_list(SHAPES), default=list(SHAPES), help="narrow, wide and/or unicode")
+    parser.add_argument("--stages", type=_name_list(STAGES), default=list(STAGES), help=", ".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (the best is compared)")
+    parser.add_argument("--merge-rows", type=int, default=1000, help="Rows merged into separate messages")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results written earlier with --output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown or memory growth (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<16} {'stage':<8} {'best':>13} {'median':>13} {'throughput':>19} {'output':>13} {'memory':>13}")
+    results = run_suite(args.sizes, args.shapes, max(1, args.repeat), args.merge_rows, args.stages,
+                        report=lambda case, case_results: print(format_case(case, case_results), flush=True))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(format_regression(regression))
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Email composition: subject, greeting, body, table and signature in; plain text + HTML out."""
+
+import html  # For escaping HTML characters
+from collections import namedtuple
+from collections.abc import Sequence
+from itertools import chain
+
+from . import metrics
+from .render import TABLE_STYLE, iter_html_table, iter_plain_table, squeeze_html
+
+# ------------------- Defaults -------------------
+
+DEFAULT_GREETING = "Hi all,"
+DEFAULT_BODY = "Please see below for details about a delivery expected to arrive at the company."
+
+# A signature block in both output formats
+Signature = namedtuple("Signature", ["html", "plain_text"])
+
+DEFAULT_SIGNATURE = Signature(
+    html="""
+    <p style='font-family: Georgia, serif; font-size: 11pt; color: #022a4d; margin-bottom: 0;'>
+        <strong>Your Name</strong><br>
+        <span style='font-size: 8pt;'>Your Position</span>
+    </p>
+    <p style='font-family: Georgia, serif; font-size: 11pt; color: #022a4d; margin-bottom: 5px;'>
+        <strong>Company Name</strong><br>
+        Address Line 1<br>
+        Address Line 2<br>
+        Tel: [Your Phone Number]<br>
+        Fax: [Your Fax Number]<br>
+        www.yourcompanywebsite.com<br>
+        info@yourcompanywebsite.com
+    </p>
+    """,
+    plain_text=(
+        "Your Name\n"
+        "Your Position\n\n"
+        "Company Name\n"
+        "Address Line 1\n"
+        "Address Line 2\n"
+        "Tel: [Your Phone Number]\n"
+        "Fax: [Your Fax Number]\n"
+        "www.yourcompanywebsite.com\n"
+        "info@yourcompanywebsite.com\n"
+    ),
+)
+
+# Result of a composition; unpacks like the old (plain_text, html_content, subject) tuple
+ComposedEmail = namedtuple("ComposedEmail", ["plain_text", "html_content", "subject"])
+
+# ------------------- Fragments -------------------
+# Each fragment renders to an (html, plain_text) pair; an email is the fragments in order
+
+HTML_OPEN = "<html><body>"
+HTML_CLOSE = "</body></html>\n    "
+# Compact mode puts the table style in the head once and drops trailing whitespace
+HTML_OPEN_COMPACT = f"<html><head>{TABLE_STYLE}</head><body>"
+HTML_CLOSE_COMPACT = "</body></html>"
+
+def body_to_html(body):
+    """Escape the body and convert blank-line paragraphs and line breaks to HTML."""
+    paragraphs = html.escape(body).split('\n\n')
+    processed_paragraphs = ["<p>{}</p>".format(para.replace('\n', '<br>')) for para in paragraphs]
+    return "<br>".join(processed_paragraphs)
+
+def resolve_text(greeting, body):
+    """Apply the default greeting and body when the inputs are blank."""
+    return greeting.strip() or DEFAULT_GREETING, body.strip() or DEFAULT_BODY
+
+def render_greeting(greeting):
+    """Render an already-resolved greeting line."""
+    return "<p>{}</p><br>".format(html.escape(greeting)), f"{greeting}\n\n"
+
+def render_body(body):
+    """Render an already-resolved body."""
+    return body_to_html(body) + "<br>", f"{body}\n\n"
+
+def render_note(note):
+    """Render a short grey note shown under the table, e.g. that rows were left out."""
+    return f"<p style='color: grey;'><em>{html.escape(note)}</em></p>", f"{note}\n\n"
+
+def render_closing(signature, compact=False):
+    """Render the closing remarks and signature block; compact squeezes the signature's indentation."""
+    signature_html = squeeze_html(signature.html) if compact else signature.html
+    return "<br><p>Regards,</p>" + signature_html, "Regards,\n" + signature.plain_text
+
+# ------------------- Composition -------------------
+
+def _peek_rows(rows):
+    """Return (has_rows, rows) without losing the first row of an iterator."""
+    if isinstance(rows, Sequence):
+        return bool(rows), rows
+    rows = iter(rows)
+    for first in rows:
+        return True, chain((first,), rows)
+    return False, ()
+
+def iter_email_html(greeting="", body="", columns=(), rows=(), signature=DEFAULT_SIGNATURE, table_note="",
+                    compact=False):
+    """
+    Yield the HTML version of the email in chunks, streaming the table rows.
+    With compact=True the table is styled by one <style> block in the head instead of per-cell styles.
+    """
+    greeting, body = resolve_text(greeting, body)
+    # Only include the table section when there is table data
+    has_rows, rows = _peek_rows(rows)
+    if compact:
+        html_open, html_close = (HTML_OPEN_COMPACT if has_rows else HTML_OPEN), HTML_CLOSE_COMPACT
+    else:
+        html_open, html_close = HTML_OPEN, HTML_CLOSE
+    yield html_open + render_greeting(greeting)[0] + render_body(body)[0]
+
+    if has_rows:
+        yield from iter_html_table(columns, rows, compact=compact)
+    if table_note:
+        yield render_note(table_note)[0]
+
+    # Add closing remarks
+    yield render_closing(signature, compact)[0] + html_close
+
+def iter_email_plain_text(greeting="", body="", columns=(), rows=(), signature=DEFAULT_SIGNATURE, table_note=""):
+    """Yield the plain text version of the email in chunks, streaming the table rows."""
+    greeting, body = resolve_text(greeting, body)
+    yield render_greeting(greeting)[1] + render_body(body)[1]
+
+    has_rows, rows = _peek_rows(rows)
+    if has_rows:
+        yield from iter_plain_table(columns, rows)
+    if table_note:
+        yield render_note(table_note)[1]
+
+    yield render_closing(signature)[1]
+
+def compose_email(subject="", greeting="", body="", columns=(), rows=(), signature=DEFAULT_SIGNATURE, table_note="",
+                  compact=False):
+    """
+    Compose an email in both plain text and HTML formats without touching any GUI state.
+    Args:
+        subject (str): The email subject.
+        greeting (str): The greeting line; defaults to DEFAULT_GREETING when blank.
+        body (str): The email body; defaults to DEFAULT_BODY when blank.
+        columns (sequence): Table column headers.
+        rows (sequence): Table rows, each a sequence of cell values.
+        signature (Signature): The closing signature block.
+        table_note (str): Optional note shown under the table.
+        compact (bool): Style the table with one <style> block instead of per-cell styles;
+            see render.inline_table_styles() for clients that need inline styles.
+    Returns:
+        ComposedEmail: plain_text, html_content and subject.
+    """
+    # Sequences (lists, TableViews) are rendered twice in place; one-shot iterators are materialised once
+    rows = rows if isinstance(rows, Sequence) else list(rows)
+    with metrics.span("render"):
+        plain_text = "".join(iter_email_plain_text(greeting, body, columns, rows, signature, table_note))
+        html_content = "".join(iter_email_html(greeting, body, columns, rows, signature, table_note, compact))
+    metrics.increment("rows_rendered", len(rows))
+    metrics.increment("html_chars", len(html_content))
+    return ComposedEmail(plain_text, html_content, subject.strip())
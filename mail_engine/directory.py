@@ -0,0 +1,266 @@
+"""
+Recipient directory.
+
+Contacts are loaded from a CSV export, an LDIF address-book dump or a SQLite
+database and indexed once for type-ahead search. A "groups" column (or LDIF
+groupOfNames entries) puts contacts into named groups, which groups.py expands.
+
+Search uses two indexes:
+
+- queries shorter than three characters use binary search over the sorted
+  address and name-word prefixes;
+- longer queries intersect the posting lists of their trigrams (smallest first)
+  and confirm the candidates with a substring check.
+
+Either way a search over tens of thousands of contacts touches only the
+matching entries, so the recipient dialog can filter on every keystroke.
+Building the trigram index takes about a second for 40k contacts, so load
+large directories off the Tk thread; small directories skip it and are scanned.
+"""
+
+import base64
+import bisect
+import csv
+import itertools
+import logging
+import os
+import sqlite3
+from array import array
+from collections import defaultdict, namedtuple
+from email.utils import parseaddr
+
+# One directory entry; address is stored as given, matching is case-insensitive
+Contact = namedtuple("Contact", ["address", "name", "groups"], defaults=((),))
+
+ADDRESS_COLUMNS = ("email", "e-mail", "email address", "mail", "address")
+NAME_COLUMNS = ("name", "display name", "displayname", "full name", "cn")
+GROUP_COLUMNS = ("groups", "group", "teams", "team", "lists")
+
+def normalize_address(address):
+    """Canonical form used to compare addresses: 'Jane <Jane@Example.com>' -> 'jane@example.com'."""
+    address = address.strip()
+    if "<" in address:
+        address = parseaddr(address)[1] or address.strip("<>")
+    return address.strip().lower()
+
+def split_groups(value):
+    """Split a cell like 'Logistics; Night shift' into group names."""
+    return tuple(name.strip() for name in value.replace(",", ";").split(";") if name.strip())
+
+# ------------------- Loaders -------------------
+
+def load_csv(path):
+    """Read contacts from a CSV file with an email column and optional name and groups columns."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [cell.strip().lower() for cell in next(reader, [])]
+        address_index = next((header.index(col) for col in ADDRESS_COLUMNS if col in header), None)
+        if address_index is None:
+            raise ValueError(f"{path} has no email column (expected one of: {', '.join(ADDRESS_COLUMNS)}).")
+        name_index = next((header.index(col) for col in NAME_COLUMNS if col in header), None)
+        group_index = next((header.index(col) for col in GROUP_COLUMNS if col in header), None)
+        contacts = []
+        for row in reader:
+            if len(row) > address_index and row[address_index].strip():
+                name = row[name_index].strip() if name_index is not None and len(row) > name_index else ""
+                groups = split_groups(row[group_index]) if group_index is not None and len(row) > group_index else ()
+                contacts.append(Contact(row[address_index].strip(), name, groups))
+        return contacts
+
+def _ldif_records(f):
+    """Yield each LDIF record as a list of (attribute, value) pairs, unfolding continuation lines."""
+    record = []
+    line = None
+    for raw in itertools.chain(f, [""]):
+        raw = raw.rstrip("\r\n")
+        if raw.startswith(" ") and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None and not line.startswith("#"):
+            attribute, _, value = line.partition(":")
+            if value.startswith(":"):
+                value = base64.b64decode(value[1:].strip()).decode("utf-8", "replace")
+            record.append((attribute.strip().lower(), value.strip()))
+        line = raw or None
+        if not raw and record:
+            yield record
+            record = []
+
+def load_ldif(path):
+    """Read contacts from an LDIF file (mail plus displayName or cn); groupOfNames entries become groups."""
+    people = []  # (dn, addresses, name)
+    memberships = defaultdict(list)  # member dn -> group names
+    with open(path, encoding="utf-8") as f:
+        for record in _ldif_records(f):
+            values = dict(record)
+            name = values.get("displayname") or values.get("cn", "")
+            members = [value for attribute, value in record if attribute in ("member", "uniquemember")]
+            if members:
+                for member in members:
+                    memberships[member.lower()].append(name)
+                continue
+            addresses = [value for attribute, value in record if attribute == "mail" and value]
+            if addresses:
+                people.append((values.get("dn", "").lower(), addresses, name))
+    contacts = []
+    for dn, addresses, name in people:
+        groups = tuple(memberships.get(dn, ()))
+        contacts.extend(Contact(address, name, groups) for address in addresses)
+    return contacts
+
+def load_sqlite(path, query="SELECT email, name FROM contacts"):
+    """Read contacts from a SQLite database; query returns (address, name) or (address, name, groups) rows."""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        contacts = []
+        for row in connection.execute(query):
+            if row[0]:
+                groups = split_groups(str(row[2] or "")) if len(row) > 2 else ()
+                contacts.append(Contact(str(row[0]).strip(), str(row[1] or "").strip(), groups))
+        return contacts
+    finally:
+        connection.close()
+
+LOADERS = {
+    ".csv": load_csv,
+    ".ldif": load_ldif,
+    ".ldf": load_ldif,
+    ".db": load_sqlite,
+    ".sqlite": load_sqlite,
+    ".sqlite3": load_sqlite,
+}
+
+def load_directory(path):
+    """
+    Load a RecipientDirectory from a .csv, .ldif or SQLite file, chosen by extension.
+    Raises:
+        ValueError: If the file type is not supported or has no email column.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    loader = LOADERS.get(extension)
+    if loader is None:
+        raise ValueError(f"Unsupported directory file {path}. Use one of: {', '.join(sorted(LOADERS))}.")
+    contacts = loader(path)
+    logging.info("Loaded %d contacts from %s", len(contacts), path)
+    return RecipientDirectory(contacts)
+
+# ------------------- Index -------------------
+
+_versions = itertools.count(1)
+
+# Below this many contacts a plain scan is as fast as the trigram index and needs no build time
+TRIGRAM_MIN_CONTACTS = 5000
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class RecipientDirectory:
+    """
+    Deduplicated contacts, sorted by address, with prefix and trigram search.
+    Contacts are addressed by their position (id) in self.contacts; self.groups maps
+    each lower-case group name to the normalised addresses of its members.
+    """
+
+    def __init__(self, contacts=()):
+        unique = {}
+        groups = defaultdict(dict)
+        for contact in contacts:
+            key = normalize_address(contact.address)
+            if not key:
+                continue
+            if key not in unique or not unique[key].name:
+                unique[key] = contact
+            for group in contact.groups:
+                groups[group.lower()][key] = None  # A dict keeps first-seen order without repeats
+        keys = sorted(unique)
+        self.contacts = [unique[key] for key in keys]
+        self._ids = {key: index for index, key in enumerate(keys)}
+        self.groups = {name: tuple(members) for name, members in groups.items()}
+        self.version = next(_versions)  # Changes whenever a directory is (re)loaded
+        self._build_index()
+
+    @classmethod
+    def from_addresses(cls, addresses):
+        return cls(Contact(address, "") for address in addresses)
+
+    def _build_index(self):
+        self._texts = texts = [f"{contact.address.lower()}\t{contact.name.lower()}" for contact in self.contacts]
+        prefixes = []
+        for index, contact in enumerate(self.contacts):
+            prefixes.append((texts[index].split("\t", 1)[0], index))
+            for word in contact.name.lower().split():
+                prefixes.append((word, index))
+        prefixes.sort()
+        self._prefix_keys = [key for key, _ in prefixes]
+        self._prefix_ids = array("I", (index for _, index in prefixes))
+
+        self._postings = None
+        if len(texts) >= TRIGRAM_MIN_CONTACTS:
+            postings = defaultdict(list)
+            for index, text in enumerate(texts):
+                for trigram in _trigrams(text):
+                    postings[trigram].append(index)  # Ids arrive in increasing order, so every list is sorted
+            self._postings = {trigram: array("I", ids) for trigram, ids in postings.items()}
+
+    def search_text(self, index):
+        """The lower-case text a contact is matched against: address, then name."""
+        return self._texts[index]
+
+    def __len__(self):
+        return len(self.contacts)
+
+    def __getitem__(self, index):
+        return self.contacts[index]
+
+    def find(self, address):
+        """Return the id of address (any case), or None."""
+        return self._ids.get(normalize_address(address))
+
+    def label(self, index):
+        """Display text, e.g. 'Jane Doe <jane@example.com>'."""
+        contact = self.contacts[index]
+        return f"{contact.name} <{contact.address}>" if contact.name else contact.address
+
+    def search(self, query, limit=None):
+        """
+        Return ids of contacts whose address or name contains query (case-insensitive),
+        address-prefix matches first. Queries under three characters match the start of
+        the address or of a name word; an empty query matches everyone.
+        """
+        query = query.strip().lower()
+        if not query:
+            ids = range(len(self.contacts))
+            return list(ids if limit is None else ids[:limit])
+        if len(query) < 3 or "\t" in query:
+            matches = self._prefix_search(query)
+        elif self._postings is None:
+            matches = [index for index, text in enumerate(self._texts) if query in text]
+        else:
+            matches = self._trigram_search(query)
+        texts = self._texts
+        first = [index for index in matches if texts[index].startswith(query)]
+        if len(first) != len(matches):
+            first.extend(index for index in matches if not texts[index].startswith(query))
+        return first if limit is None else first[:limit]
+
+    def _prefix_search(self, query):
+        keys = self._prefix_keys
+        start = bisect.bisect_left(keys, query)
+        stop = bisect.bisect_left(keys, query + "\uffff", start)
+        return sorted(set(self._prefix_ids[start:stop]))
+
+    def _trigram_search(self, query):
+        lists = []
+        for trigram in _trigrams(query):
+            ids = self._postings.get(trigram)
+            if ids is None:
+                return []
+            lists.append(ids)
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for ids in lists[1:]:
+            if len(candidates) < 64:
+                break  # Cheaper to confirm the few candidates left than to intersect further
+            candidates.intersection_update(ids)
+        texts = self._texts
+        return sorted(index for index in candidates if query in texts[index])
@@ -0,0 +1,117 @@
+"""
+In-process stand-ins for Windows-only dependencies.
+
+FakeOutlook mimics the small part of the Outlook COM object model the app uses,
+so OutlookSession/OutlookTransport caching and reconnect behaviour can be exercised
+on Linux:
+
+    outlook = FakeOutlook()
+    transport = OutlookTransport(OutlookSession(dispatch=outlook.dispatch, coinitialize=lambda: None))
+    transport.send(item)
+    outlook.restart()  # Cached objects now raise RPC_E_DISCONNECTED
+
+FakeClipboard stands in for the win32clipboard module when pasting is benchmarked.
+"""
+
+import threading
+
+RPC_E_DISCONNECTED = -2147417848
+
+class FakeComError(Exception):
+    """Shaped like pywintypes.com_error: args[0] and .hresult carry the HRESULT."""
+
+    def __init__(self, hresult, message="COM error"):
+        super().__init__(hresult, message)
+        self.hresult = hresult
+
+class FakeAttachments:
+    def __init__(self, mail):
+        self._mail = mail
+        self.items = []
+
+    def Add(self, Source):
+        self._mail._check()
+        self.items.append(Source)
+
+class FakeMailItem:
+    def __init__(self, outlook, generation):
+        self._outlook = outlook
+        self._generation = generation
+        self.Subject = ""
+        self.BodyFormat = 0
+        self.HTMLBody = ""
+        self.Body = ""
+        self.To = ""
+        self.CC = ""
+        self.Attachments = FakeAttachments(self)
+
+    def _check(self):
+        self._outlook._check(self._generation)
+
+    def Send(self):
+        self._check()
+        with self._outlook._lock:
+            self._outlook.sent.append(self)
+
+class FakeNamespace:
+    def __init__(self, name):
+        self.Name = name
+
+class FakeApplication:
+    def __init__(self, outlook, generation):
+        self._outlook = outlook
+        self._generation = generation
+
+    def CreateItem(self, item_type):
+        self._outlook._check(self._generation)
+        return FakeMailItem(self._outlook, self._generation)
+
+    def GetNamespace(self, name):
+        self._outlook._check(self._generation)
+        return FakeNamespace(name)
+
+class FakeOutlook:
+    """A fake Outlook process; dispatch() is a drop-in for win32com.client.Dispatch."""
+
+    def __init__(self):
+        self.generation = 0
+        self.dispatches = 0
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def dispatch(self, prog_id):
+        self.dispatches += 1
+        return FakeApplication(self, self.generation)
+
+    def restart(self):
+        """Simulate Outlook restarting: every object handed out so far is disconnected."""
+        self.generation += 1
+
+    def _check(self, generation):
+        if generation != self.generation:
+            raise FakeComError(RPC_E_DISCONNECTED, "The object invoked has disconnected from its clients.")
+
+class FakeClipboard:
+    """The win32clipboard functions the app calls, serving text set with set_text()."""
+
+    CF_TEXT = 1
+    CF_UNICODETEXT = 13
+
+    def __init__(self, text=""):
+        self.text = text
+        self.opened = 0
+
+    def set_text(self, text):
+        self.text = text
+
+    def OpenClipboard(self):
+        self.opened += 1
+
+    def CloseClipboard(self):
+        pass
+
+    def IsClipboardFormatAvailable(self, format):
+        return format in (self.CF_UNICODETEXT, self.CF_TEXT)
+
+    def GetClipboardData(self, format):
+        return self.text if format == self.CF_UNICODETEXT else self.text.encode("utf-8")
@@ -0,0 +1,201 @@
+"""
+Recipient groups.
+
+A recipient list may name groups as well as addresses: team aliases from a JSON
+file ({"ops": ["ann@example.com", "night-shift"], ...}, where members may be
+other groups) and the groups defined by the recipient directory. expand() turns
+such a list into deduplicated, normalised addresses.
+
+Each group's expansion is memoised and the memo is dropped whenever the alias
+file or the directory changes, so resolving the same large nested list for every
+send costs a dictionary lookup. Groups that include each other are expanded to
+everything they reach whichever is asked for first; only results that do not
+depend on a skipped loop are memoised. chunk_recipients() then splits huge recipient
+sets into several messages under a per-message recipient limit.
+"""
+
+import json
+import logging
+import os
+
+from .directory import RecipientDirectory, normalize_address
+
+# Exchange Online rejects messages with more than 500 recipients by default
+DEFAULT_MAX_RECIPIENTS = 500
+
+def is_group_name(entry):
+    """Entries without an @ refer to groups."""
+    return "@" not in entry
+
+def load_aliases(path):
+    """
+    Read {group: [members]} from a JSON file; member lists may also be ';' separated strings.
+    Raises:
+        ValueError: If the file is not a JSON object of lists or strings.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must contain a JSON object mapping group names to member lists.")
+    aliases = {}
+    for name, members in data.items():
+        if isinstance(members, str):
+            members = members.replace(",", ";").split(";")
+        if not isinstance(members, list):
+            raise ValueError(f"Group '{name}' in {path} must be a list of members.")
+        aliases[name.strip().lower()] = tuple(str(member).strip() for member in members if str(member).strip())
+    return aliases
+
+class GroupBook:
+    """
+    Resolves group names to addresses from aliases and a RecipientDirectory.
+    Aliases win over directory groups of the same name.
+    """
+
+    def __init__(self, aliases=None, directory=None, path=None):
+        self.path = path  # Alias file, re-read by reload_if_changed()
+        self._aliases = {name.lower(): tuple(members) for name, members in (aliases or {}).items()}
+        self._directory = directory or RecipientDirectory()
+        self._alias_version = 0
+        self._file_key = None
+        self._memo = {}
+        self._memo_key = None
+
+    @classmethod
+    def from_file(cls, path, directory=None):
+        book = cls(directory=directory, path=path)
+        book.reload_if_changed()
+        return book
+
+    def set_directory(self, directory):
+        self._directory = directory  # Its new version invalidates the memo on next use
+
+    def set_aliases(self, aliases):
+        self._aliases = {name.lower(): tuple(members) for name, members in aliases.items()}
+        self._alias_version += 1
+
+    def reload_if_changed(self):
+        """Re-read the alias file when its mtime or size changed; returns True when it was reloaded."""
+        if not self.path:
+            return False
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key == self._file_key:
+            return False
+        try:
+            self.set_aliases(load_aliases(self.path))
+        except (OSError, ValueError) as e:
+            logging.error("Could not load recipient groups from %s: %s", self.path, e)
+            return False
+        self._file_key = key
+        logging.info("Loaded %s recipient groups from %s", len(self._aliases), self.path)
+        return True
+
+    def names(self):
+        """All known group names, lower case."""
+        return sorted(set(self._aliases) | set(self._directory.groups))
+
+    def __contains__(self, name):
+        name = name.strip().lower()
+        return name in self._aliases or name in self._directory.groups
+
+    def expand_group(self, name):
+        """
+        Return the normalised addresses of group name, nested groups included.
+        Raises:
+            KeyError: If name is not a known group.
+        """
+        key = (self._alias_version, self._directory.version)
+        if key != self._memo_key:
+            self._memo = {}
+            self._memo_key = key
+        return self._expand(name.strip().lower(), (), {})[0]
+
+    def _expand(self, name, parents, partial):
+        """
+        Return (addresses, open) for name. open holds the ancestors whose loops were skipped: the
+        addresses then lack those ancestors' members, so they are only kept in partial, for the
+        rest of this expansion, and never memoised.
+        """
+        cached = self._memo.get(name)
+        if cached is not None:
+            return cached, frozenset()
+        if name in partial:
+            return partial[name]
+        if name in self._aliases:
+            members = self._aliases[name]
+        elif name in self._directory.groups:
+            members = self._directory.groups[name]
+        else:
+            raise KeyError(name)
+        addresses = {}
+        open_loops = set()
+        for member in members:
+            if not is_group_name(member):
+                addresses.setdefault(normalize_address(member), None)
+                continue
+            member = member.lower()
+            if member in parents or member == name:
+                logging.warning("Recipient group '%s' includes itself through '%s'; ignoring the loop", name, member)
+                if member != name:
+                    open_loops.add(member)
+                continue
+            member_addresses, member_open = self._expand(member, parents + (name,), partial)
+            open_loops.update(member_open)
+            for address in member_addresses:
+                addresses.setdefault(address, None)
+        open_loops.discard(name)  # Everything reachable from name has now been added
+        result = tuple(addresses)
+        if open_loops:
+            partial[name] = (result, frozenset(open_loops))
+            return partial[name]
+        self._memo[name] = result
+        return result, frozenset()
+
+    def expand(self, entries, exclude=()):
+        """
+        Expand a list of addresses and group names into unique normalised addresses, in order.
+        Args:
+            exclude (iterable): Addresses to leave out, e.g. those already in To when expanding CC.
+        Raises:
+            ValueError: If an entry names an unknown group.
+        """
+        seen = {normalize_address(address) for address in exclude}
+        result = []
+        unknown = []
+        for entry in entries:
+            if is_group_name(entry):
+                try:
+                    addresses = self.expand_group(entry)
+                except KeyError:
+                    unknown.append(entry)
+                    continue
+            else:
+                addresses = (normalize_address(entry),)
+            for address in addresses:
+                if address and address not in seen:
+                    seen.add(address)
+                    result.append(address)
+        if unknown:
+            raise ValueError(f"Unknown recipient group(s): {', '.join(unknown)}.")
+        return result
+
+def chunk_recipients(to, cc=(), limit=DEFAULT_MAX_RECIPIENTS):
+    """
+    Split recipients into [(to, cc), ...] messages of at most limit recipients each,
+    filling every message with To addresses before CC ones.
+    """
+    if limit < 1:
+        raise ValueError("The recipient limit must be at least 1.")
+    recipients = [("to", address) for address in to] + [("cc", address) for address in cc]
+    chunks = []
+    for start in range(0, len(recipients), limit):
+        batch = recipients[start:start + limit]
+        chunks.append((
+            [address for kind, address in batch if kind == "to"],
+            [address for kind, address in batch if kind == "cc"],
+        ))
+    return chunks or [([], [])]
@@ -0,0 +1,199 @@
+"""
+On-disk template and signature library.
+
+A library is a directory of template files, one template per file:
+
+    library/
+        delivery-notice.txt
+        logistics/weekly-summary.txt      (sub-folder names become tags)
+        signatures/default.html           (plus an optional default.txt plain-text version)
+
+A template file may start with a header of "key: value" lines ended by a line of
+three dashes; without one the whole file is the body:
+
+    name: Weekly summary
+    tags: logistics, weekly
+    subject: Deliveries for week {week}
+    ---
+    Please see below for the {row_count} orders expected this week.
+
+scan() re-reads only files whose mtime or size changed, so polling it every few
+seconds is cheap even with hundreds of templates and picks up edits without a
+restart. Built-in templates and DEFAULT_SIGNATURE fill in for anything the
+directory does not define.
+"""
+
+import html
+import logging
+import os
+import re
+from collections import namedtuple
+
+from .compose import DEFAULT_SIGNATURE, Signature
+from .template import TemplateError, compile_template
+
+TEMPLATE_EXTENSIONS = (".txt", ".tmpl")
+SIGNATURE_FOLDER = "signatures"
+
+# One library template; path is None for built-in templates
+LibraryTemplate = namedtuple("LibraryTemplate", ["name", "tags", "subject", "body", "path"])
+
+# ------------------- Parsing -------------------
+
+_HEADER_LINE = re.compile(r"^(\w+)\s*:\s*(.*)$")
+
+def parse_template_file(text, default_name, folder_tags=()):
+    """Split a template file into a LibraryTemplate (without path) from its optional header."""
+    header = {}
+    body = text
+    lines = text.splitlines(keepends=True)
+    for index, line in enumerate(lines):
+        if line.strip() == "---":
+            header_lines = lines[:index]
+            if all(_HEADER_LINE.match(entry.strip()) for entry in header_lines if entry.strip()):
+                header = dict(_HEADER_LINE.match(entry.strip()).groups() for entry in header_lines if entry.strip())
+                body = "".join(lines[index + 1:])
+            break
+        if line.strip() and not _HEADER_LINE.match(line.strip()):
+            break
+    tags = [tag.strip().lower() for tag in header.get("tags", "").split(",") if tag.strip()]
+    tags.extend(tag.lower() for tag in folder_tags if tag.lower() not in tags)
+    return LibraryTemplate(header.get("name", default_name).strip(), tuple(tags), header.get("subject", "").strip(),
+                           body.strip("\n"), None)
+
+_LINE_BREAK = re.compile(r"<br\s*/?>", re.IGNORECASE)
+_PARAGRAPH_END = re.compile(r"</p\s*>", re.IGNORECASE)
+_TAG = re.compile(r"<[^>]+>")
+
+def html_to_plain_text(markup):
+    """Derive a plain-text signature from HTML: <br> and paragraphs become line breaks, tags are dropped."""
+    text = " ".join(markup.split("\n"))  # Source line breaks are just whitespace in HTML
+    text = _TAG.sub("", _PARAGRAPH_END.sub("\n\n", _LINE_BREAK.sub("\n", text)))
+    lines = [" ".join(line.split()) for line in html.unescape(text).split("\n")]
+    return "\n".join(lines).strip("\n") + "\n"
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+# ------------------- Library -------------------
+
+class TemplateLibrary:
+    """
+    Templates and signatures loaded from directory, indexed by name and tag.
+    Args:
+        directory (str): The library folder; it may not exist yet.
+        defaults (iterable): Built-in LibraryTemplates used when the folder has no template of that name.
+        default_signature (Signature): Used when the folder has no signature of the requested name.
+    """
+
+    def __init__(self, directory, defaults=(), default_signature=DEFAULT_SIGNATURE):
+        self.directory = directory
+        self.defaults = list(defaults)
+        self.default_signature = default_signature
+        self.version = 0  # Bumped whenever scan() finds a change
+        self._files = {}  # path -> ((mtime_ns, size), parsed value)
+        self._templates = {}
+        self._tags = {}
+        self._signatures = {}
+        self._index()
+
+    def scan(self):
+        """Re-read new and changed files and forget deleted ones; returns True when anything changed."""
+        seen = {}
+        changed = False
+        for path, folder_tags in self._walk():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Deleted between listing and stat
+            key = (stat.st_mtime_ns, stat.st_size)
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == key:
+                seen[path] = cached
+                continue
+            try:
+                seen[path] = (key, self._load(path, folder_tags))
+            except (OSError, UnicodeDecodeError) as e:
+                logging.warning("Skipping library file %s: %s", path, e)
+                continue
+            changed = True
+        if changed or seen.keys() != self._files.keys():
+            self._files = seen
+            self._index()
+            self.version += 1
+            logging.info("Template library reloaded: %s templates, %s signatures", len(self._templates), len(self._signatures))
+            return True
+        return False
+
+    def _walk(self):
+        """Yield (path, folder_tags) for every template and signature file under the directory."""
+        if not os.path.isdir(self.directory):
+            return
+        for folder, subfolders, files in os.walk(self.directory):
+            subfolders[:] = sorted(name for name in subfolders if not name.startswith("."))
+            relative = os.path.relpath(folder, self.directory)
+            folder_tags = () if relative == "." else tuple(relative.split(os.sep))
+            for name in sorted(files):
+                if name.lower().endswith(TEMPLATE_EXTENSIONS + (".html",)):
+                    yield os.path.join(folder, name), folder_tags
+
+    def _load(self, path, folder_tags):
+        stem, extension = os.path.splitext(os.path.basename(path))
+        if folder_tags[:1] == (SIGNATURE_FOLDER,):
+            return ("signature", stem, extension.lower(), _read(path))
+        if extension.lower() == ".html":
+            return None  # Only signatures are HTML
+        template = parse_template_file(_read(path), stem, folder_tags)._replace(path=path)
+        try:
+            compile_template(template.body)
+        except TemplateError as e:
+            logging.warning("Template %s has an error and will be inserted as plain text: %s", path, e)
+        return template
+
+    def _index(self):
+        """Rebuild the name, tag and signature indexes from the defaults and the loaded files."""
+        templates = {template.name: template for template in self.defaults}
+        signature_parts = {}
+        for _, value in self._files.values():
+            if isinstance(value, LibraryTemplate):
+                if value.name in templates and templates[value.name].path is not None:
+                    logging.warning("Duplicate template name '%s' in %s", value.name, value.path)
+                templates[value.name] = value
+            elif value is not None:
+                _, stem, extension, text = value
+                signature_parts.setdefault(stem, {})[extension] = text
+        tags = {}
+        for template in templates.values():
+            for tag in template.tags:
+                tags.setdefault(tag, []).append(template.name)
+        signatures = {}
+        for stem, parts in signature_parts.items():
+            if ".html" in parts:
+                signatures[stem] = Signature(parts[".html"], parts.get(".txt") or html_to_plain_text(parts[".html"]))
+        self._templates, self._tags, self._signatures = templates, tags, signatures
+
+    # ------------------- Lookups -------------------
+
+    def names(self, tag=None):
+        """Template names, sorted, optionally only those carrying tag."""
+        if tag is None:
+            return sorted(self._templates, key=str.lower)
+        return sorted(self._tags.get(tag.lower(), ()), key=str.lower)
+
+    def tags(self):
+        return sorted(self._tags)
+
+    def get(self, name):
+        """Return the LibraryTemplate called name, or None."""
+        return self._templates.get(name)
+
+    def signature(self, name="default"):
+        """Return the named signature, falling back to the built-in one."""
+        return self._signatures.get(name, self.default_signature)
+
+    def signature_names(self):
+        return sorted(self._signatures)
+
+    def __len__(self):
+        return len(self._templates)
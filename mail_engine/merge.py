@@ -0,0 +1,177 @@
+"""
+Mail merge: one template, one personalised email per table row.
+
+Subject, greeting and body are templates (see template.py) whose {column}
+placeholders are filled from each row; each is compiled once per merge. Messages are rendered in batches and handed to a worker pool, and every
+send is reported back as a MergeStatus instead of interrupting the user.
+"""
+
+import functools
+import logging
+import time
+from collections import namedtuple
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import metrics
+from .compose import DEFAULT_SIGNATURE, compose_email
+from .message import make_mail_item
+from .template import TemplateError, compile_template, table_context
+
+# Result of sending one merged message; duplicate marks one skipped as identical to a message already queued or sent
+MergeStatus = namedtuple("MergeStatus", ["index", "to", "ok", "error", "seconds", "duplicate"], defaults=(False,))
+
+# ------------------- Placeholders -------------------
+
+@functools.lru_cache(maxsize=256)
+def _compile(text):
+    """
+    Return a render function for text; text with a broken {% %} tag is used unchanged.
+    Failures are cached too, so a half-typed tag in the live preview is parsed and logged once.
+    Sending uses compile_template() instead, so a broken template stops the send.
+    """
+    try:
+        return compile_template(text).render
+    except TemplateError as e:
+        logging.debug("Could not fill placeholders in %r: %s", text, e)
+        return lambda values: text
+
+def fill_placeholders(text, values):
+    """Replace {column} placeholders in text with values; unknown placeholders are left untouched. For previews."""
+    if "{" not in text and "}}" not in text:
+        return text
+    return _compile(text)(values)
+
+def find_recipient_column(columns):
+    """Return the first column that looks like an email address column, or None."""
+    for col in columns:
+        if str(col).strip().lower() in ("email", "e-mail", "email address", "to"):
+            return col
+    return None
+
+def split_addresses(value):
+    """Split a cell holding one or more ';' or ',' separated addresses."""
+    return [address.strip() for address in str(value).replace(",", ";").split(";") if address.strip()]
+
+# ------------------- Rendering -------------------
+
+def render_merge(subject, greeting, body, columns, rows, recipient_column=None, to=(), cc=(),
+                 attachments=(), include_row_table=True, signature=DEFAULT_SIGNATURE, compact=False, context=None):
+    """
+    Yield one MailItem per row with the row's values substituted into the template.
+    Args:
+        recipient_column: Column holding each row's To address(es); when None or empty
+            for a row, the static to list is used.
+        include_row_table (bool): Embed the row itself as a one-row table.
+        compact (bool): Compose compact HTML, as in compose_email().
+        context (dict): Table-wide values ({row_count}, rows, {columns}) every row can use, with the
+            row's own values taking priority; defaults to table_context() of rows when rows is a Sequence.
+    Raises:
+        TemplateError: If the subject, greeting or body has a broken {% %} tag; raised by this call,
+            before any row is rendered.
+    """
+    columns = [str(col) for col in columns]
+    position = columns.index(str(recipient_column)) if recipient_column is not None else None
+    if context is None:
+        context = table_context(columns, rows) if isinstance(rows, Sequence) else {}
+    templates = [compile_template(text).render for text in (subject, greeting, body)]
+    return _iter_merge(templates, columns, rows, position, to, cc, attachments, include_row_table, signature,
+                       compact, context)
+
+def _iter_merge(templates, columns, rows, position, to, cc, attachments, include_row_table, signature, compact, context):
+    fill_subject, fill_greeting, fill_body = templates
+    for row in rows:
+        values = dict(context)
+        values.update(zip(columns, (str(value) for value in row)))
+        row_to = split_addresses(row[position]) if position is not None else []
+        composed = compose_email(
+            subject=fill_subject(values),
+            greeting=fill_greeting(values),
+            body=fill_body(values),
+            columns=columns if include_row_table else (),
+            rows=[row] if include_row_table else (),
+            signature=signature,
+            compact=compact,
+        )
+        yield make_mail_item(composed, row_to or to, cc, attachments)
+
+def iter_batches(items, size):
+    """Yield lists of at most size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ------------------- Sending -------------------
+
+class MergeReport:
+    """Outcome of a merge run: per-message statuses and overall throughput."""
+
+    def __init__(self):
+        self.statuses = []
+        self.elapsed = 0.0
+
+    @property
+    def sent(self):
+        return sum(1 for status in self.statuses if status.ok)
+
+    @property
+    def failed(self):
+        return [status for status in self.statuses if not status.ok and not status.duplicate]
+
+    @property
+    def duplicates(self):
+        return [status for status in self.statuses if status.duplicate]
+
+    @property
+    def throughput(self):
+        """Messages processed per second."""
+        return len(self.statuses) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        skipped = f", {len(self.duplicates)} skipped as duplicates" if self.duplicates else ""
+        return (f"{self.sent} of {len(self.statuses)} emails sent in {self.elapsed:.1f}s "
+                f"({self.throughput:.1f} msg/s), {len(self.failed)} failed{skipped}.")
+
+def _timed_send(send, index, item):
+    """Send one item and return its MergeStatus instead of raising."""
+    started = time.perf_counter()
+    try:
+        send(item)
+        status = MergeStatus(index, item.to, True, None, time.perf_counter() - started)
+    except Exception as e:
+        logging.error("Mail merge message %s to %s failed: %s", index, item.to, e)
+        status = MergeStatus(index, item.to, False, str(e), time.perf_counter() - started)
+    metrics.REGISTRY.observe("send", status.seconds)
+    metrics.increment("messages_sent" if status.ok else "messages_failed")
+    return status
+
+def send_merge(items, send, max_workers=4, batch_size=50, on_status=None):
+    """
+    Send merged items through a worker pool, one batch of rendered messages at a time.
+    Args:
+        items (iterable): MailItems, typically from render_merge().
+        send (callable): Sends one MailItem; exceptions mark that message as failed.
+        on_status (callable): Called with each MergeStatus as it completes.
+    Returns:
+        MergeReport
+    """
+    report = MergeReport()
+    started = time.perf_counter()
+    index = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for batch in iter_batches(items, batch_size):
+            futures = [pool.submit(_timed_send, send, index + offset, item) for offset, item in enumerate(batch)]
+            index += len(batch)
+            for future in as_completed(futures):
+                status = future.result()
+                report.statuses.append(status)
+                if on_status is not None:
+                    on_status(status)
+    report.statuses.sort(key=lambda status: status.index)
+    report.elapsed = time.perf_counter() - started
+    return report
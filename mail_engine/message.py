@@ -0,0 +1,15 @@
+"""The outgoing message passed between composition, merge and sending."""
+
+from collections import namedtuple
+
+# A fully composed message; tuples keep it hashable and cheap to pickle to worker processes
+MailItem = namedtuple(
+    "MailItem",
+    ["subject", "html_content", "plain_text", "to", "cc", "attachments"],
+    defaults=((), (), ()),
+)
+
+def make_mail_item(composed, to=(), cc=(), attachments=()):
+    """Build a MailItem from a ComposedEmail and recipient/attachment lists."""
+    plain_text, html_content, subject = composed
+    return MailItem(subject, html_content, plain_text, tuple(to), tuple(cc), tuple(attachments))
@@ -0,0 +1,149 @@
+"""
+Lightweight instrumentation: timing spans and counters.
+
+    with metrics.span("render"):
+        html = ...
+    metrics.increment("rows_rendered", len(rows))
+
+Spans keep a count, total, and maximum duration per name and counters keep a
+running total, all in memory behind one lock, so instrumenting a hot path costs
+two perf_counter() calls. write() exports everything as JSON, or as Prometheus
+text when the file name ends in .prom, for a dashboard or a cron job to pick up.
+
+The engine records into the module-level REGISTRY:
+
+    spans     parse, render, preview, attach, send
+    counters  rows_parsed, chars_parsed, rows_rendered, html_chars, attachments_added,
+              attachment_bytes_hashed, messages_sent, messages_failed
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+class _Span:
+    """Context manager timing one span; created by Metrics.span()."""
+
+    __slots__ = ("_metrics", "_name", "_started")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics.observe(self._name, time.perf_counter() - self._started)
+        return False
+
+class Metrics:
+    """A registry of spans (durations) and counters, safe to update from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}  # name -> [count, total seconds, max seconds]
+        self._counters = {}  # name -> value
+        self.started = time.time()
+
+    def span(self, name):
+        """Return a context manager recording how long its block took under name."""
+        return _Span(self, name)
+
+    def observe(self, name, seconds):
+        """Record one duration for name."""
+        with self._lock:
+            entry = self._spans.get(name)
+            if entry is None:
+                self._spans[name] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def merge(self, snapshot):
+        """Add the spans and counters of another registry's snapshot(), e.g. one taken in a worker process."""
+        with self._lock:
+            for name, values in snapshot["spans"].items():
+                entry = self._spans.get(name)
+                if entry is None:
+                    self._spans[name] = [values["count"], values["total_seconds"], values["max_seconds"]]
+                else:
+                    entry[0] += values["count"]
+                    entry[1] += values["total_seconds"]
+                    entry[2] = max(entry[2], values["max_seconds"])
+            for name, value in snapshot["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        """Return {"spans": {name: {count, total_seconds, max_seconds}}, "counters": {name: value}}."""
+        with self._lock:
+            spans = {name: {"count": count, "total_seconds": total, "max_seconds": maximum}
+                     for name, (count, total, maximum) in self._spans.items()}
+            counters = dict(self._counters)
+        return {"started": self.started, "spans": spans, "counters": counters}
+
+    # ------------------- Export -------------------
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix="mail_"):
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        if snapshot["spans"]:
+            name = f"{prefix}span_seconds"
+            lines.append(f"# TYPE {name} summary")
+            for span, values in sorted(snapshot["spans"].items()):
+                label = f'{{span="{_escape_label(span)}"}}'
+                lines.append(f"{name}_count{label} {values['count']}")
+                lines.append(f"{name}_sum{label} {values['total_seconds']:.6f}")
+            lines.append(f"# TYPE {prefix}span_max_seconds gauge")
+            for span, values in sorted(snapshot["spans"].items()):
+                lines.append(f'{prefix}span_max_seconds{{span="{_escape_label(span)}"}} {values["max_seconds"]:.6f}')
+        for counter, value in sorted(snapshot["counters"].items()):
+            name = f"{prefix}{_metric_name(counter)}_total"
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to path atomically: Prometheus text for .prom files, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temporary, path)  # Readers never see a half-written file
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# ------------------- Default Registry -------------------
+
+REGISTRY = Metrics()
+
+def span(name):
+    return REGISTRY.span(name)
+
+def increment(name, value=1):
+    REGISTRY.increment(name, value)
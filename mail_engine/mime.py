@@ -0,0 +1,144 @@
+"""
+Streaming MIME builder.
+
+iter_message() produces a complete RFC 5322 message as a stream of byte chunks:
+
+    multipart/mixed                 (only when there are attachments)
+        multipart/alternative
+            text/plain; charset="utf-8"
+            text/html; charset="utf-8"
+        application/pdf ...         (one part per attachment, base64)
+
+Attachments are read and base64-encoded in chunks of a multiple of 57 bytes, so
+every chunk is a run of whole 76-character lines and a 100 MB file is written
+with about 64 KB of memory. Lines end in CRLF throughout, as SMTP requires, and
+every part is 7bit or base64, so no server needs 8BITMIME.
+
+write_message() writes the stream to a binary file (an .eml file) and
+message_bytes() joins it for transports that need the whole message.
+"""
+
+import base64
+import functools
+import mimetypes
+import os
+import socket
+import uuid
+from email.policy import SMTP
+from email.utils import encode_rfc2231, formatdate, make_msgid
+
+CRLF = b"\r\n"
+ENCODE_CHUNK_BYTES = 57 * 1150  # About 64 KB of file per read; a multiple of 57 keeps base64 lines whole
+MAX_LINE_BYTES = 998  # Longest line RFC 5322 allows; longer text is sent base64-encoded
+
+def guess_content_type(path):
+    ctype, encoding = mimetypes.guess_type(path)
+    if ctype is None or encoding is not None:
+        return "application/octet-stream"
+    return ctype
+
+@functools.lru_cache(maxsize=1)
+def _message_id_domain():
+    return socket.getfqdn()  # May need a DNS lookup, so it is looked up once per process
+
+def _boundary():
+    return f"mca-{uuid.uuid4().hex}"  # Base64 lines and our headers never start with "--mca-"
+
+# ------------------- Headers -------------------
+
+def header(name, value):
+    """Return one folded header line as bytes, RFC 2047-encoding non-ASCII text."""
+    return SMTP.fold_binary(*SMTP.header_store_parse(name, value))
+
+def _param(name, value):
+    """A Content-Type/Content-Disposition parameter, RFC 2231-encoded when it is not plain ASCII."""
+    if value.isascii() and value.isprintable():
+        return '%s="%s"' % (name, value.replace("\\", "\\\\").replace('"', '\\"'))
+    return f"{name}*={encode_rfc2231(value, 'utf-8')}"
+
+def message_headers(item, sender=None, date=None, message_id=None):
+    """Return the top-level headers of item (From, To, Cc, Subject, Date, Message-ID, MIME-Version)."""
+    lines = []
+    if sender:
+        lines.append(header("From", sender))
+    if item.to:
+        lines.append(header("To", ", ".join(item.to)))
+    if item.cc:
+        lines.append(header("Cc", ", ".join(item.cc)))
+    lines.append(header("Subject", item.subject))
+    lines.append(header("Date", date or formatdate(localtime=True)))
+    lines.append(header("Message-ID", message_id or make_msgid(domain=_message_id_domain())))
+    lines.append(b"MIME-Version: 1.0\r\n")
+    return b"".join(lines)
+
+# ------------------- Parts -------------------
+
+def _base64_lines(data):
+    """Base64-encode data as 76-character CRLF-terminated lines."""
+    return base64.encodebytes(data).replace(b"\n", CRLF)
+
+def text_part(text, subtype="plain"):
+    """Return a complete text/<subtype> part: 7bit when it is short-lined ASCII, base64 otherwise."""
+    data = text.replace("\r\n", "\n").replace("\n", "\r\n").encode("utf-8")
+    if not data.endswith(CRLF):
+        data += CRLF
+    if data.isascii() and all(len(line) <= MAX_LINE_BYTES for line in data.split(CRLF)):
+        encoding, body = "7bit", data
+    else:
+        encoding, body = "base64", _base64_lines(data)
+    return (f'Content-Type: text/{subtype}; charset="utf-8"\r\n'
+            f"Content-Transfer-Encoding: {encoding}\r\n\r\n").encode("ascii") + body
+
+def attachment_headers(name, content_type):
+    return (f"Content-Type: {content_type}\r\n"
+            f"Content-Transfer-Encoding: base64\r\n"
+            f"Content-Disposition: attachment; {_param('filename', name)}\r\n\r\n").encode("ascii")
+
+def iter_attachment_part(path, name=None, content_type=None, chunk_bytes=ENCODE_CHUNK_BYTES):
+    """Yield an attachment part for the file at path: its headers, then the base64 body chunk by chunk."""
+    if chunk_bytes % 57:
+        raise ValueError("chunk_bytes must be a multiple of 57 so base64 lines do not straddle chunks.")
+    yield attachment_headers(name or os.path.basename(path), content_type or guess_content_type(path))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            yield _base64_lines(chunk)
+
+# ------------------- Messages -------------------
+
+def iter_message(item, sender=None, attachment_parts=None, date=None, message_id=None):
+    """
+    Yield the bytes of item as a MIME message.
+    Args:
+        attachment_parts (callable): Returns the encoded part (an iterable of bytes) for an attachment
+            path, e.g. AttachmentManager.encoded_part; defaults to streaming each file with iter_attachment_part().
+    """
+    parts = attachment_parts or iter_attachment_part
+    alternative = _boundary()
+    body = (f"--{alternative}\r\n".encode("ascii") + text_part(item.plain_text, "plain")
+            + f"\r\n--{alternative}\r\n".encode("ascii") + text_part(item.html_content, "html")
+            + f"\r\n--{alternative}--\r\n".encode("ascii"))
+    alternative_type = f'Content-Type: multipart/alternative; boundary="{alternative}"\r\n'.encode("ascii")
+
+    yield message_headers(item, sender, date, message_id)
+    if not item.attachments:
+        yield alternative_type + CRLF + body
+        return
+    mixed = _boundary()
+    yield (f'Content-Type: multipart/mixed; boundary="{mixed}"\r\n\r\n--{mixed}\r\n'.encode("ascii")
+           + alternative_type + CRLF + body)
+    for path in item.attachments:
+        yield f"\r\n--{mixed}\r\n".encode("ascii")
+        yield from parts(path)
+    yield f"\r\n--{mixed}--\r\n".encode("ascii")
+
+def write_message(fp, item, sender=None, attachment_parts=None):
+    """Write item to the binary file fp (e.g. an .eml file); returns the number of bytes written."""
+    written = 0
+    for chunk in iter_message(item, sender, attachment_parts):
+        fp.write(chunk)
+        written += len(chunk)
+    return written
+
+def message_bytes(item, sender=None, attachment_parts=None):
+    """Return item as one bytes object."""
+    return b"".join(iter_message(item, sender, attachment_parts))
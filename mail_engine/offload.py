@@ -0,0 +1,180 @@
+"""
+Large-table offload.
+
+Above a row or estimated-size threshold, embedding the whole table inline makes
+multi-megabyte messages that mail clients struggle with. compose_with_offload()
+then embeds only the first head_rows rows plus a note, and streams the full table
+into a compressed attachment (gzip or zip CSV, or XLSX when openpyxl is installed)
+straight from the table view, without building a second copy in memory. The
+attachment's folder is named after a digest of the table, so the same table sent
+twice is the same file and the outbox recognises the second email as a duplicate.
+"""
+
+import gzip
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import namedtuple
+from collections.abc import Sequence
+
+from .compose import DEFAULT_SIGNATURE, compose_email
+from .render import table_to_html
+from .tabular import write_delimited
+
+FORMATS = ("csv.gz", "zip", "xlsx")
+
+# When to offload and how; max_bytes applies to the estimated HTML table size
+OffloadPolicy = namedtuple(
+    "OffloadPolicy",
+    ["max_rows", "max_bytes", "head_rows", "format", "directory"],
+    defaults=(2000, 1_000_000, 50, "csv.gz", None),
+)
+
+# ------------------- Sizing -------------------
+
+def estimate_html_bytes(columns, rows, sample_rows=200, compact=False):
+    """Estimate the HTML table size by rendering a sample of rows and scaling up."""
+    total = len(rows)
+    if not total:
+        return 0
+    sample = rows[:sample_rows]
+    size = len(table_to_html(columns, sample, compact).encode("utf-8"))
+    return int(size * total / len(sample))
+
+def needs_offload(columns, rows, policy, compact=False):
+    """Return True when the table is too large to embed inline under policy."""
+    if len(rows) > policy.max_rows:
+        return True
+    return estimate_html_bytes(columns, rows, compact=compact) > policy.max_bytes
+
+# ------------------- Attachment Writers -------------------
+
+def _stem(text, limit=40):
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-")[:limit] or "table"
+
+def table_attachment_name(subject, policy):
+    """The file name a table offloaded from an email with this subject is attached under."""
+    return f"{_stem(subject)}.{policy.format}"
+
+def write_table_attachment(view, path, format="csv.gz"):
+    """
+    Stream a TableView (or any object with columns and row iteration) to path.
+    CSV is written as UTF-8 with a byte-order mark so Excel detects the encoding.
+    Returns the path written.
+    """
+    if format == "csv.gz":
+        with gzip.open(path, "wt", encoding="utf-8-sig", newline="") as f:
+            write_delimited(view, f)
+    elif format == "zip":
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            csv_name = os.path.basename(path)[:-len(".zip")] + ".csv"
+            with archive.open(csv_name, "w") as raw:
+                with io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f:
+                    write_delimited(view, f)
+    elif format == "xlsx":
+        try:
+            from openpyxl import Workbook  # Optional dependency, only needed for XLSX output
+        except ImportError:
+            raise ValueError("XLSX attachments need the openpyxl package; use csv.gz or zip instead.") from None
+        workbook = Workbook(write_only=True)  # Write-only mode streams rows to disk
+        sheet = workbook.create_sheet("Table")
+        sheet.append(list(view.columns))
+        for row in view:
+            sheet.append(list(row))
+        workbook.save(path)
+    else:
+        raise ValueError(f"Unsupported table attachment format: {format}. Choose one of {', '.join(FORMATS)}.")
+    return path
+
+# ------------------- Composition -------------------
+
+def compose_with_offload(subject="", greeting="", body="", columns=(), rows=(), signature=DEFAULT_SIGNATURE,
+                         policy=OffloadPolicy(), compact=False):
+    """
+    Compose like compose_email(), moving a large table into a compressed attachment.
+    Args:
+        rows: A Sequence of rows, ideally a TableView so slicing is free.
+    Returns:
+        (ComposedEmail, list of attachment paths created)
+    """
+    if not isinstance(rows, Sequence):
+        rows = list(rows)
+    if not len(rows) or not needs_offload(columns, rows, policy, compact):
+        return compose_email(subject, greeting, body, columns, rows, signature, compact=compact), []
+
+    # A folder per table keeps the attachment's name readable for recipients. It is named after the
+    # table's content, so sending the same table again attaches the same file and the outbox sees a duplicate
+    view = rows if hasattr(rows, "columns") else _RowsWithColumns(columns, rows)
+    directory = policy.directory or tempfile.gettempdir()
+    name = table_attachment_name(subject, policy)
+    table_dir = os.path.join(directory, f"table-{table_digest(view, name, policy.format)[:32]}")
+    path = os.path.join(table_dir, name)
+    if os.path.isfile(path):
+        logging.info("Offloaded %d-row table is already in %s", len(rows), path)
+    else:
+        os.makedirs(directory, exist_ok=True)
+        partial_dir = tempfile.mkdtemp(prefix="table-partial-", dir=directory)
+        try:
+            write_table_attachment(view, os.path.join(partial_dir, name), policy.format)
+            os.makedirs(table_dir, exist_ok=True)
+            os.replace(os.path.join(partial_dir, name), path)  # Never attach a half-written table
+        finally:
+            shutil.rmtree(partial_dir, ignore_errors=True)
+        logging.info("Offloaded %d-row table to %s (%d bytes)", len(rows), path, os.path.getsize(path))
+
+    head = rows[:policy.head_rows]
+    note = (f"Showing the first {len(head):,} of {len(rows):,} rows. "
+            f"The full table is attached as {os.path.basename(path)}.")
+    composed = compose_email(subject, greeting, body, columns, head, signature, table_note=note, compact=compact)
+    return composed, [path]
+
+def table_digest(view, name, format):
+    """SHA-256 hex digest of a table's columns and rows and the name and format it is attached under."""
+    digest = hashlib.sha256(repr((name, format, [str(col) for col in view.columns])).encode("utf-8"))
+    for row in view:
+        digest.update(repr(tuple(row)).encode("utf-8"))
+    return digest.hexdigest()
+
+def is_table_attachment(path, policy):
+    """Return True when path is a table attachment compose_with_offload() wrote under policy."""
+    message_dir = os.path.dirname(os.path.abspath(path))
+    return (os.path.basename(message_dir).startswith("table-")
+            and os.path.dirname(message_dir) == os.path.abspath(policy.directory or tempfile.gettempdir()))
+
+def remove_table_attachment(path, policy):
+    """Delete a table attachment together with its folder; returns False for any other file."""
+    if not is_table_attachment(path, policy):
+        return False
+    shutil.rmtree(os.path.dirname(os.path.abspath(path)), ignore_errors=True)
+    return True
+
+def remove_unused_table_attachments(policy, keep=()):
+    """
+    Delete every table folder under policy.directory that holds none of the paths in keep,
+    e.g. tables left by emails that were sent, cancelled or given up on in an earlier session.
+    Returns the number of folders removed.
+    """
+    if not policy.directory or not os.path.isdir(policy.directory):
+        return 0
+    kept = {os.path.dirname(os.path.abspath(path)) for path in keep}
+    removed = 0
+    for entry in os.scandir(policy.directory):
+        if entry.is_dir() and entry.name.startswith("table-") and os.path.abspath(entry.path) not in kept:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+class _RowsWithColumns:
+    """Pairs plain row sequences with their column names for the attachment writers."""
+
+    def __init__(self, columns, rows):
+        self.columns = list(columns)
+        self._rows = rows
+
+    def __iter__(self):
+        return iter(self._rows)
@@ -0,0 +1,212 @@
+"""
+Persistent outbox.
+
+Messages are written to a SQLite database before they are sent, so a failed send or
+a crash never loses them. Failed sends are retried with exponential backoff until
+max_attempts, identical messages are deduplicated by content hash, and messages that
+were mid-send when the process died are replayed on the next start.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from .message import MailItem
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"  # Gave up after max_attempts
+CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_hash ON outbox (content_hash);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+# ------------------- Serialisation -------------------
+
+def dump_item(item):
+    """Serialise a MailItem to JSON text."""
+    return json.dumps(item._asdict(), ensure_ascii=False, sort_keys=True)
+
+def load_item(payload):
+    """Rebuild a MailItem from dump_item() output."""
+    data = json.loads(payload)
+    for key in ("to", "cc", "attachments"):
+        data[key] = tuple(data[key])
+    return MailItem(**data)
+
+def content_hash(item):
+    """SHA-256 of the serialised message; identical messages share a hash."""
+    return hashlib.sha256(dump_item(item).encode("utf-8")).hexdigest()
+
+# ------------------- Rate Limiting -------------------
+
+class RateLimiter:
+    """Token bucket allowing rate sends per second with bursts of up to burst."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a send is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+# ------------------- Outbox -------------------
+
+class Outbox:
+    """
+    SQLite-backed outbox.
+    Args:
+        path (str): Database file; created with its directory if missing.
+        max_attempts (int): Sends tried before a message is marked dead.
+        base_delay / max_delay (float): Backoff is base_delay * 2**(attempts - 1), capped at max_delay, with jitter.
+        dedupe_window (float): Seconds after sending during which an identical message is treated as a duplicate.
+    """
+
+    def __init__(self, path, max_attempts=6, base_delay=30.0, max_delay=3600.0, dedupe_window=24 * 3600):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dedupe_window = dedupe_window
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        recovered = self.recover()
+        if recovered:
+            logging.info("Outbox: %s message(s) interrupted mid-send will be retried", recovered)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def recover(self):
+        """Return messages left in 'sending' by a crash to 'pending'; returns how many."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE outbox SET status = ?, next_attempt = ?, updated = ? WHERE status = ?",
+                (PENDING, time.time(), time.time(), SENDING),
+            )
+            return cursor.rowcount
+
+    def add(self, item):
+        """Persist item for sending; returns its id, or None if an identical message is already queued or recently sent."""
+        digest = content_hash(item)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                duplicate = self._db.execute(
+                    "SELECT id FROM outbox WHERE content_hash = ? AND "
+                    "(status IN (?, ?) OR (status = ? AND updated > ?)) LIMIT 1",
+                    (digest, PENDING, SENDING, SENT, now - self.dedupe_window),
+                ).fetchone()
+                if duplicate:
+                    self._db.execute("COMMIT")
+                    logging.info("Outbox: skipped duplicate of message %s", duplicate[0])
+                    return None
+                cursor = self._db.execute(
+                    "INSERT INTO outbox (content_hash, payload, status, next_attempt, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (digest, dump_item(item), PENDING, now, now, now),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return cursor.lastrowid
+
+    def pending(self):
+        """Return (id, item, next_attempt) for every message still waiting to be sent, oldest first."""
+        rows = self._execute(
+            "SELECT id, payload, next_attempt FROM outbox WHERE status = ? ORDER BY id", (PENDING,)
+        )
+        return [(message_id, load_item(payload), next_attempt) for message_id, payload, next_attempt in rows]
+
+    def mark_sending(self, message_id):
+        self._execute("UPDATE outbox SET status = ?, updated = ? WHERE id = ?", (SENDING, time.time(), message_id))
+
+    def mark_sent(self, message_id):
+        self._execute(
+            "UPDATE outbox SET status = ?, attempts = attempts + 1, last_error = NULL, updated = ? WHERE id = ?",
+            (SENT, time.time(), message_id),
+        )
+
+    def mark_cancelled(self, message_id):
+        self._execute("UPDATE outbox SET status = ?, updated = ? WHERE id = ?", (CANCELLED, time.time(), message_id))
+
+    def mark_failed(self, message_id, error):
+        """Record a failed attempt; returns the retry delay in seconds, or None once the message is dead."""
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM outbox WHERE id = ?", (message_id,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            now = time.time()
+            if attempts >= self.max_attempts:
+                self._db.execute(
+                    "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, updated = ? WHERE id = ?",
+                    (DEAD, attempts, str(error), now, message_id),
+                )
+                return None
+            delay = self.backoff(attempts)
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, next_attempt = ?, updated = ? WHERE id = ?",
+                (PENDING, attempts, str(error), now + delay, now, message_id),
+            )
+        return delay
+
+    def backoff(self, attempts):
+        """Delay before the next try after attempts failures, with +/-20% jitter to spread retries."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def counts(self):
+        """Return {status: number of messages}."""
+        return dict(self._execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+
+    def purge_sent(self, older_than=7 * 24 * 3600):
+        """Delete sent and cancelled messages older than older_than seconds; returns how many."""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM outbox WHERE status IN (?, ?) AND updated < ?",
+                (SENT, CANCELLED, time.time() - older_than),
+            )
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
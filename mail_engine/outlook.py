@@ -0,0 +1,121 @@
+"""
+Outlook over COM with a long-lived session.
+
+Dispatching Outlook.Application costs hundreds of milliseconds, so OutlookSession
+creates it lazily once per thread (COM objects belong to the thread that made them),
+caches it together with the MAPI namespace, and re-dispatches if Outlook has been
+restarted underneath it. win32com is only imported on first use; pass dispatch= and
+coinitialize= (see mail_engine.fakes) to run the same code without Outlook.
+"""
+
+import logging
+import threading
+
+from .transport import Transport, existing_attachments
+
+# HRESULTs meaning the Outlook process behind a cached object has gone away
+DISCONNECTED_HRESULTS = frozenset({
+    -2147417848,  # RPC_E_DISCONNECTED: the object invoked has disconnected from its clients
+    -2147023174,  # RPC_S_SERVER_UNAVAILABLE: the RPC server is unavailable
+    -2147220995,  # CO_E_OBJNOTCONNECTED: object is not connected to server
+    -2147023170,  # RPC_S_CALL_FAILED: the remote procedure call failed
+})
+
+OL_MAIL_ITEM = 0  # olMailItem
+OL_FORMAT_HTML = 2  # olFormatHTML
+
+def is_disconnected_error(error):
+    """Return True if a COM error means Outlook was closed or restarted."""
+    hresult = getattr(error, "hresult", None)
+    if hresult is None and getattr(error, "args", None):
+        hresult = error.args[0]
+    return hresult in DISCONNECTED_HRESULTS
+
+def _default_dispatch(prog_id):
+    import win32com.client as win32  # Windows-only; imported on first use
+    return win32.Dispatch(prog_id)
+
+def _default_coinitialize():
+    import pythoncom  # Windows-only; imported on first use
+    pythoncom.CoInitialize()
+
+class OutlookSession:
+    """Lazily created, per-thread cache of the Outlook application and MAPI namespace."""
+
+    def __init__(self, dispatch=None, coinitialize=None):
+        self._dispatch = dispatch or _default_dispatch
+        self._coinitialize = coinitialize or _default_coinitialize
+        self._local = threading.local()
+        self.dispatch_count = 0
+
+    @property
+    def application(self):
+        app = getattr(self._local, "application", None)
+        if app is None:
+            if not getattr(self._local, "com_ready", False):
+                self._coinitialize()  # COM must be initialised on every thread that uses it
+                self._local.com_ready = True
+            app = self._dispatch('Outlook.Application')
+            self.dispatch_count += 1
+            self._local.application = app
+            self._local.namespace = None
+            logging.debug("Dispatched Outlook.Application")
+        return app
+
+    @property
+    def namespace(self):
+        app = self.application
+        if self._local.namespace is None:
+            self._local.namespace = app.GetNamespace("MAPI")
+        return self._local.namespace
+
+    def reset(self):
+        """Drop the cached objects for this thread so the next use re-dispatches."""
+        self._local.application = None
+        self._local.namespace = None
+
+    def call(self, operation):
+        """Run operation(application), reconnecting and retrying once if Outlook was restarted."""
+        try:
+            return operation(self.application)
+        except Exception as e:
+            if not is_disconnected_error(e):
+                raise
+            logging.warning("Outlook connection lost (%s); reconnecting.", e)
+            self.reset()
+            return operation(self.application)
+
+class OutlookTransport(Transport):
+    """Send through the local Outlook client, reusing one OutlookSession across sends."""
+
+    def __init__(self, session=None):
+        self.session = session or OutlookSession()
+
+    def send(self, item):
+        attachments, warnings = existing_attachments(item)
+
+        def send_with(app):
+            attach_warnings = []
+            mail = app.CreateItem(OL_MAIL_ITEM)
+            mail.Subject = item.subject
+            mail.BodyFormat = OL_FORMAT_HTML
+            mail.HTMLBody = item.html_content
+            mail.To = ";".join(item.to)
+            mail.CC = ";".join(item.cc)
+
+            # Fetch the Attachments collection once rather than once per file
+            if attachments:
+                add = mail.Attachments.Add
+                for file_path in attachments:
+                    try:
+                        add(Source=file_path)
+                    except Exception as e:
+                        if is_disconnected_error(e):
+                            raise
+                        logging.error("Failed to attach file %s: %s", file_path, e)
+                        attach_warnings.append(f"Failed to attach file: {file_path}\n{e}")
+
+            mail.Send()
+            return attach_warnings
+
+        return warnings + self.session.call(send_with)
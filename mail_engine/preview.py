@@ -0,0 +1,150 @@
+"""
+Incremental preview rendering.
+
+PreviewRenderer keeps the rendered greeting, body, table and closing fragments keyed
+by their inputs and only re-renders the fragments whose inputs changed, so editing
+the greeting of an email with a 20k-row table does not re-render the table.
+
+The table is previewed one page of page_rows rows at a time with a summary of the
+rows not shown, so preview cost stays constant however large the table is. Given
+the offload policy used when sending, the summary also says when the sent email
+will show only the first rows and attach the full table instead.
+"""
+
+from collections import namedtuple
+from collections.abc import Sequence
+
+from . import metrics
+from .compose import (
+    DEFAULT_SIGNATURE,
+    HTML_CLOSE,
+    HTML_OPEN,
+    ComposedEmail,
+    render_body,
+    render_closing,
+    render_greeting,
+    render_note,
+    resolve_text,
+)
+from .offload import needs_offload, table_attachment_name
+from .render import table_to_html, table_to_plain_text
+
+# Rows per preview page; even, so alternating row colours line up across pages
+DEFAULT_PAGE_ROWS = 200
+
+# The fragments of a preview, in email order
+Fragments = namedtuple("Fragments", ["greeting", "body", "table", "closing"])
+
+class PreviewRenderer:
+    """
+    Compose emails from cached fragments, re-rendering only what changed since the last call.
+    Args:
+        offload_policy (OffloadPolicy): The policy sends use, so the preview can say when the table will be attached.
+        compact (bool): Whether sends use compact HTML, which changes the size that decides offloading.
+            The preview itself keeps inline styles, as the HTML view ignores <style> blocks.
+    """
+
+    def __init__(self, page_rows=DEFAULT_PAGE_ROWS, offload_policy=None, compact=False):
+        self.page_rows = page_rows
+        self.offload_policy = offload_policy
+        self.compact = compact
+        self._cache = {}  # fragment name -> (key, (html, plain_text))
+        self._offload = (None, False)  # (table key, whether sending offloads that table)
+        self.rendered = set()  # Fragments re-rendered by the last compose()
+        self.total_rows = 0  # Rows in the table of the last compose()
+
+    def page_count(self, total_rows=None):
+        """Number of preview pages for total_rows (defaults to the last composed table)."""
+        total_rows = self.total_rows if total_rows is None else total_rows
+        return max(1, -(-total_rows // self.page_rows))
+
+    def _fragment(self, name, key, render):
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = render()
+        self._cache[name] = (key, value)
+        self.rendered.add(name)
+        return value
+
+    def invalidate(self, name=None):
+        """Forget one cached fragment, or all of them."""
+        if name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(name, None)
+
+    def offloaded(self, columns, rows, table_key):
+        """Return True when sending will attach this table instead of embedding it; cached per table."""
+        if self.offload_policy is None or not len(rows):
+            return False
+        key = (columns, table_key)
+        if self._offload[0] != key:
+            self._offload = (key, needs_offload(columns, rows, self.offload_policy, self.compact))
+        return self._offload[1]
+
+    def fragments(self, greeting="", body="", columns=(), rows=(), table_key=None, signature=DEFAULT_SIGNATURE, page=0,
+                  subject=""):
+        """
+        Return the rendered Fragments, with the table cut to preview page number page.
+        Args:
+            table_key: Identifies the table contents (e.g. TableModel.version); when None
+                the table is keyed on the rows themselves, which must then be hashable.
+            subject: Names the attachment an offloaded table is sent as.
+        """
+        self.rendered = set()
+        greeting, body = resolve_text(greeting, body)
+        columns = tuple(columns)
+        if not isinstance(rows, Sequence):
+            rows = list(rows)
+        if table_key is None:
+            rows = tuple(tuple(row) for row in rows)
+            table_key = hash(rows)
+        self.total_rows = len(rows)
+        page = max(0, min(page, self.page_count() - 1))
+        attachment = (table_attachment_name(subject.strip(), self.offload_policy)
+                      if self.offloaded(columns, rows, table_key) else None)
+        return Fragments(
+            self._fragment("greeting", greeting, lambda: render_greeting(greeting)),
+            self._fragment("body", body, lambda: render_body(body)),
+            self._fragment("table", (columns, table_key, page, self.page_rows, attachment),
+                           lambda: self._render_table(columns, rows, page, attachment)),
+            self._fragment("closing", signature, lambda: render_closing(signature)),
+        )
+
+    def _render_table(self, columns, rows, page, attachment=None):
+        total = len(rows)
+        if not total:
+            return "", ""
+        start = page * self.page_rows
+        stop = min(start + self.page_rows, total)
+        window = rows[start:stop]  # A zero-copy view when rows is a TableView
+        html_table, text_table = table_to_html(columns, window), table_to_plain_text(columns, window)
+        if start == 0 and stop == total and attachment is None:
+            return html_table, text_table
+        sent_rows = min(self.offload_policy.head_rows, total) if attachment else None
+        html_note, text_note = page_summary(start, stop, total, sent_rows, attachment)
+        return html_table + html_note, text_table + text_note
+
+    def compose(self, subject="", greeting="", body="", columns=(), rows=(), table_key=None,
+                signature=DEFAULT_SIGNATURE, page=0):
+        """Compose like compose_email() for preview page page, reusing every fragment whose inputs are unchanged."""
+        with metrics.span("preview"):
+            parts = self.fragments(greeting, body, columns, rows, table_key, signature, page, subject)
+            html_content = HTML_OPEN + "".join(part[0] for part in parts) + HTML_CLOSE
+            plain_text = "".join(part[1] for part in parts)
+        return ComposedEmail(plain_text, html_content, subject.strip())
+
+def page_summary(start, stop, total, sent_rows=None, attachment=None):
+    """
+    Describe the rows a preview page leaves out, e.g. '+ 48,213 more rows', and what the sent email holds.
+    Args:
+        sent_rows / attachment: When the table is offloaded, the rows the sent email shows and the attachment's file name.
+    """
+    hidden = total - (stop - start)
+    if attachment:
+        sent = f"the sent email shows the first {sent_rows:,} rows and attaches the full table as {attachment}"
+    else:
+        sent = "the sent email includes all rows"
+    shown = f"+ {hidden:,} more rows; {sent}" if hidden else sent
+    return render_note(f"Showing rows {start + 1:,}-{stop:,} of {total:,} ({shown})")
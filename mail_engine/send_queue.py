@@ -0,0 +1,249 @@
+"""
+Background send queue.
+
+SendQueue sends MailItems on worker threads so the caller (the Tk event loop) never
+blocks on COM dispatch, attachments or the network. Jobs can be cancelled while
+queued, and progress is reported through callbacks.
+
+With an Outbox, every message is persisted before it is queued: failed sends are
+re-queued after the outbox's backoff delay, duplicates are skipped, and replay()
+resumes whatever was still unsent when the application last stopped.
+
+Tk widgets may only be touched from the main thread, so a GUI passes a CallbackPump:
+workers post callbacks into it and the main loop runs them with pump.drain(), polled
+via root.after(). Without a pump, callbacks run on the worker thread.
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from . import metrics
+
+QUEUED = "queued"
+SENDING = "sending"
+RETRYING = "retrying"  # Failed, waiting for the outbox backoff delay
+SENT = "sent"
+FAILED = "failed"
+CANCELLED = "cancelled"
+DUPLICATE = "duplicate"  # Identical to a message already in the outbox
+
+class CallbackPump:
+    """Thread-safe hand-off of callbacks from worker threads to the thread that calls drain()."""
+
+    def __init__(self):
+        self._calls = queue.SimpleQueue()
+
+    def post(self, fn, *args):
+        self._calls.put((fn, args))
+
+    def drain(self, limit=100):
+        """Run up to limit pending callbacks; returns how many ran."""
+        ran = 0
+        while ran < limit:
+            try:
+                fn, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception:
+                logging.exception("Send queue callback failed")
+            ran += 1
+        return ran
+
+class SendJob:
+    """One queued message and its outcome."""
+
+    def __init__(self, job_id, item, on_done, label, outbox_id=None):
+        self.id = job_id
+        self.item = item
+        self.outbox_id = outbox_id
+        self.label = label or item.subject
+        self.on_done = on_done
+        self.status = QUEUED
+        self.warnings = []
+        self.error = None
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def cancel(self):
+        """Cancel the job if it has not started sending; returns True on success."""
+        with self._lock:
+            if self.status not in (QUEUED, RETRYING):
+                return False
+            self.status = CANCELLED
+        return True
+
+    def wait(self, timeout=None):
+        """Block until the job is sent, failed or cancelled-and-skipped."""
+        return self._finished.wait(timeout)
+
+    def _start(self):
+        with self._lock:
+            if self.status not in (QUEUED, RETRYING):
+                return False
+            self.status = SENDING
+        return True
+
+class SendQueue:
+    """
+    Send MailItems through transport on background worker threads.
+    Args:
+        transport: Any Transport; Outlook needs workers=1 or a per-thread session (the default).
+        pump (CallbackPump): Where callbacks are delivered; None runs them on the worker thread.
+        on_depth (callable): Called with the number of unfinished jobs whenever it changes.
+        outbox (Outbox): Persist messages before sending and retry failures with backoff.
+        rate_limiter (RateLimiter): Caps the send rate across all workers.
+    """
+
+    def __init__(self, transport, workers=1, pump=None, on_depth=None, outbox=None, rate_limiter=None):
+        self.transport = transport
+        self.pump = pump
+        self.on_depth = on_depth
+        self.outbox = outbox
+        self.rate_limiter = rate_limiter
+        self._timers = set()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending = {}  # job id -> SendJob, for queued and in-flight jobs
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"send-queue-{n}", daemon=True)
+            for n in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def depth(self):
+        """Number of jobs queued or being sent."""
+        with self._lock:
+            return len(self._pending)
+
+    def submit(self, item, on_done=None, label=None):
+        """Queue item for sending; on_done(job) is called once it is sent, failed, cancelled or a duplicate."""
+        outbox_id = None
+        if self.outbox is not None:
+            outbox_id = self.outbox.add(item)
+            if outbox_id is None:
+                job = SendJob(next(self._ids), item, on_done, label)
+                job.status = DUPLICATE
+                job._finished.set()
+                self._call(on_done, job)
+                return job
+        return self._enqueue(SendJob(next(self._ids), item, on_done, label, outbox_id))
+
+    def replay(self, on_done=None):
+        """Queue every message the outbox still holds from an earlier run; returns the jobs."""
+        if self.outbox is None:
+            return []
+        jobs = []
+        for outbox_id, item, next_attempt in self.outbox.pending():
+            job = SendJob(next(self._ids), item, on_done, None, outbox_id)
+            jobs.append(self._enqueue(job, delay=next_attempt - time.time()))
+        if jobs:
+            logging.info("Replaying %s unsent message(s) from the outbox", len(jobs))
+        return jobs
+
+    def _enqueue(self, job, delay=0):
+        with self._lock:
+            self._pending[job.id] = job
+        self._schedule(job, delay)
+        self._notify_depth()
+        return job
+
+    def _schedule(self, job, delay):
+        """Put job on the queue now, or after delay seconds."""
+        if delay <= 0:
+            self._queue.put(job)
+            return
+        timer = threading.Timer(delay, self._fire_timer, (job,))
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def _fire_timer(self, job):
+        with self._lock:
+            self._timers = {timer for timer in self._timers if timer.is_alive() and timer is not threading.current_thread()}
+        self._queue.put(job)
+
+    def cancel_all(self):
+        """Cancel every job that has not started sending; returns how many were cancelled."""
+        with self._lock:
+            cancelled = [job for job in self._pending.values() if job.cancel()]
+            for job in cancelled:
+                del self._pending[job.id]  # The worker still skips it and calls on_done
+        if self.outbox is not None:
+            for job in cancelled:
+                if job.outbox_id is not None:
+                    self.outbox.mark_cancelled(job.outbox_id)
+        self._notify_depth()
+        return len(cancelled)
+
+    def shutdown(self, wait=True):
+        """Stop the workers after the jobs already queued; retries still waiting stay in the outbox."""
+        with self._lock:
+            timers, self._timers = self._timers, set()
+        for timer in timers:
+            timer.cancel()
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _call(self, fn, *args):
+        if fn is None:
+            return
+        if self.pump is not None:
+            self.pump.post(fn, *args)
+        else:
+            try:
+                fn(*args)
+            except Exception:
+                logging.exception("Send queue callback failed")
+
+    def _notify_depth(self):
+        self._call(self.on_depth, self.depth)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job._start():
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                if job.outbox_id is not None:
+                    self.outbox.mark_sending(job.outbox_id)
+                started = time.perf_counter()
+                try:
+                    with metrics.span("send"):
+                        job.warnings = self.transport.send(job.item) or []
+                    job.status = SENT
+                    metrics.increment("messages_sent")
+                    if job.outbox_id is not None:
+                        self.outbox.mark_sent(job.outbox_id)
+                except Exception as e:
+                    logging.error("Sending '%s' failed: %s", job.label, e)
+                    metrics.increment("messages_failed")
+                    job.error = str(e)
+                    job.status = FAILED
+                    if job.outbox_id is not None:
+                        delay = self.outbox.mark_failed(job.outbox_id, e)
+                        if delay is not None:
+                            logging.warning("Retrying '%s' in %.0fs", job.label, delay)
+                            job.status = RETRYING
+                            self._schedule(job, delay)
+                            continue
+                job.seconds = time.perf_counter() - started
+            with self._lock:
+                self._pending.pop(job.id, None)
+            job._finished.set()
+            self._call(job.on_done, job)
+            self._notify_depth()
@@ -0,0 +1,329 @@
+"""
+Table ingestion and the table model.
+
+parse_table() turns clipboard text copied from Excel into a TableModel with the csv
+module, collecting per-column display widths in the same pass, so pasting needs
+neither pandas nor a second walk over the data. read_table_file() and
+iter_table_file() do the same for TSV, CSV and XLSX files (XLSX needs openpyxl).
+
+TableModel is the single copy of the pasted data. Each column is packed into the
+most compact lossless form (64-bit integers, doubles, dictionary codes or plain
+text) and every consumer - the on-screen table, HTML and plain-text rendering,
+attachments - reads it through TableView windows that never copy the columns.
+"""
+
+import csv
+import datetime
+import io
+import itertools
+import os
+from array import array
+from collections.abc import Sequence
+
+from . import metrics
+
+def unique_headers(headers):
+    """Name blank headers 'Unnamed: N' and suffix repeats with '.1', '.2' so every column id is unique."""
+    seen = {}
+    result = []
+    for index, header in enumerate(headers):
+        name = header.strip() or f"Unnamed: {index}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        result.append(name)
+    return result
+
+# ------------------- Parsing -------------------
+
+def _read_rows(text, sep):
+    """
+    Return (columns, rows) where rows lazily yields padded tuples of strings.
+    Short rows are padded with empty cells and blank lines are skipped; quoted
+    cells (Excel quotes cells containing tabs or line breaks) are unquoted.
+    """
+    return _shape_rows(csv.reader(io.StringIO(text), delimiter=sep), "clipboard")
+
+def _shape_rows(reader, source):
+    """Split records (lists of strings, header first) into (columns, padded row tuples)."""
+    header = next(reader, None)
+    if not header or not any(cell.strip() for cell in header):
+        raise ValueError(f"No data found in {source}.")
+
+    # Excel often leaves a trailing empty column; drop trailing blank headers
+    while len(header) > 1 and not header[-1].strip():
+        header.pop()
+    columns = unique_headers(header)
+    width = len(columns)
+    blank = [""] * width
+
+    def rows():
+        for line_number, row in enumerate(reader, start=2):
+            if not row or not any(row):
+                continue
+            count = len(row)
+            if count > width:
+                # Tolerate trailing empty cells, as Excel emits them for ragged selections
+                if any(row[width:]):
+                    raise ValueError(f"Failed to parse {source} data: expected {width} fields in line {line_number}, saw {count}.")
+                row = row[:width]
+            elif count < width:
+                row = row + blank[count:]
+            yield tuple(row)
+
+    return columns, rows()
+
+def parse_table(text, sep="\t"):
+    """
+    Parse delimited text whose first line is the header row straight into a TableModel.
+    Raises:
+        ValueError: If there is no header row or a row has more cells than headers.
+    """
+    with metrics.span("parse"):
+        model = _build_model(*_read_rows(text, sep))
+    metrics.increment("rows_parsed", len(model))
+    metrics.increment("chars_parsed", len(text))
+    return model
+
+def _build_model(columns, rows):
+    """Pack (columns, rows) from _shape_rows() into a TableModel, measuring column widths on the way."""
+    widths = [len(col) for col in columns]
+    buffers = [[] for _ in columns]
+    appends = [buffer.append for buffer in buffers]
+    for row in rows:
+        for index, value in enumerate(row):
+            appends[index](value)
+            if len(value) > widths[index]:
+                widths[index] = len(value)
+    packed = []
+    for index in range(len(buffers)):
+        packed.append(pack_column(buffers[index]))
+        buffers[index] = None  # Release each text buffer as soon as it is packed
+    return TableModel(columns, packed, widths)
+
+# ------------------- Table Files -------------------
+
+TABLE_FILE_SEPARATORS = {".tsv": "\t", ".txt": "\t", ".tab": "\t", ".csv": ","}
+
+def _cell_text(value):
+    """Show a spreadsheet cell the way Excel copies it: whole numbers without '.0', dates without midnight."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat(sep=" ")
+    return str(value)
+
+def _file_records(path):
+    """Yield the records of a TSV, CSV or XLSX file as lists of strings, reading it as a stream."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook  # Optional dependency, only needed for XLSX input
+        except ImportError:
+            raise ValueError("Reading XLSX files needs the openpyxl package; save the sheet as CSV instead.") from None
+        workbook = load_workbook(path, read_only=True, data_only=True)  # Read-only mode streams rows from disk
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield [_cell_text(value) for value in row]
+        finally:
+            workbook.close()
+        return
+    sep = TABLE_FILE_SEPARATORS.get(extension)
+    if sep is None:
+        raise ValueError(f"Unsupported table file {path}. Use one of: {', '.join(sorted(TABLE_FILE_SEPARATORS))}, .xlsx.")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.reader(f, delimiter=sep)
+
+def iter_table_file(path):
+    """
+    Return (columns, rows) for a table file, where rows lazily yields tuples of strings,
+    so a file can be processed in chunks without holding it in memory.
+    Raises:
+        ValueError: If the file type is not supported, is empty or has a row with too many cells.
+    """
+    return _shape_rows(_file_records(path), path)
+
+def read_table_file(path):
+    """Read a TSV, CSV or XLSX file into a TableModel."""
+    with metrics.span("parse"):
+        model = _build_model(*iter_table_file(path))
+    metrics.increment("rows_parsed", len(model))
+    return model
+
+# ------------------- Column Storage -------------------
+
+class TextColumn:
+    """Cells kept as the original strings."""
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = tuple(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def iter(self, start, stop):
+        if start == 0 and stop == len(self.values):
+            return iter(self.values)
+        return map(self.values.__getitem__, range(start, stop))
+
+class CodedColumn:
+    """Repetitive text stored once per distinct value plus a 32-bit code per cell."""
+    __slots__ = ("labels", "codes")
+
+    def __init__(self, labels, codes):
+        self.labels = labels
+        self.codes = codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return self.labels[self.codes[index]]
+
+    def iter(self, start, stop):
+        return map(self.labels.__getitem__, memoryview(self.codes)[start:stop])
+
+class NumberColumn:
+    """Integers or floats in a typed array; only used when str()/repr() gives back the original text."""
+    __slots__ = ("numbers", "format")
+
+    def __init__(self, numbers, format):
+        self.numbers = numbers
+        self.format = format
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __getitem__(self, index):
+        return self.format(self.numbers[index])
+
+    def iter(self, start, stop):
+        return map(self.format, memoryview(self.numbers)[start:stop])
+
+def _pack_numbers(values, typecode, convert, format):
+    numbers = array(typecode)
+    append = numbers.append
+    try:
+        for value in values:
+            number = convert(value)
+            if format(number) != value:
+                return None  # e.g. "007" or "1.50" would not render back identically
+            append(number)
+    except (ValueError, OverflowError):
+        return None
+    return NumberColumn(numbers, format)
+
+def pack_column(values):
+    """Pack a list of cell strings into the most compact column type that renders them unchanged."""
+    if not values:
+        return TextColumn(())
+    column = _pack_numbers(values, "q", int, str) or _pack_numbers(values, "d", float, repr)
+    if column is not None:
+        return column
+
+    # Dictionary-encode columns where most values repeat (supplier names, statuses, dates)
+    labels = {}
+    for value in values:
+        labels.setdefault(value, len(labels))
+        if len(labels) > len(values) // 2:
+            return TextColumn(values)
+    codes = array("I", map(labels.__getitem__, values))
+    return CodedColumn(list(labels), codes)
+
+# ------------------- Model and Views -------------------
+
+_versions = itertools.count(1)
+
+class TableModel:
+    """
+    The pasted table: column names, packed column storage and display widths.
+    Models are immutable; every paste creates a new one with a new version number,
+    which caches can use as a key.
+    """
+
+    def __init__(self, columns=(), column_data=None, widths=None):
+        self.columns = list(columns)
+        if column_data is None:
+            column_data = [TextColumn(()) for _ in self.columns]
+        self._data = [data if hasattr(data, "iter") else TextColumn(data) for data in column_data]
+        self._length = len(self._data[0]) if self._data else 0
+        self.widths = list(widths) if widths is not None else [len(col) for col in self.columns]
+        self.version = next(_versions)
+
+    def __len__(self):
+        return self._length
+
+    def view(self, start=0, stop=None):
+        """Return a zero-copy TableView of rows start..stop."""
+        stop = self._length if stop is None else max(start, min(stop, self._length))
+        return TableView(self, start, stop)
+
+    def row(self, index):
+        """Return one row as a tuple of strings."""
+        return tuple(data[index] for data in self._data)
+
+    def iter_rows(self, start=0, stop=None):
+        """Yield rows start..stop as tuples of strings."""
+        return iter(self.view(start, stop))
+
+    def column(self, name):
+        """Return the storage of one column (indexable, with len())."""
+        return self._data[self.columns.index(name)]
+
+    def column_types(self):
+        """Return {column: storage type name}, e.g. for diagnostics."""
+        return {col: type(data).__name__ for col, data in zip(self.columns, self._data)}
+
+class TableView(Sequence):
+    """A window of rows over a TableModel; iterating builds row tuples on the fly without copying columns."""
+
+    __slots__ = ("model", "start", "stop")
+
+    def __init__(self, model, start, stop):
+        self.model = model
+        self.start = start
+        self.stop = stop
+
+    @property
+    def columns(self):
+        return self.model.columns
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        if self.start >= self.stop:
+            return iter(())
+        return zip(*(data.iter(self.start, self.stop) for data in self.model._data))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return TableView(self.model, self.start + start, self.start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("table row index out of range")
+        return self.model.row(self.start + index)
+
+def write_delimited(view, fp, sep=",", header=True):
+    """Stream a view to a text file as CSV (or another delimiter) row by row; returns rows written."""
+    writer = csv.writer(fp, delimiter=sep, lineterminator="\r\n")
+    if header:
+        writer.writerow(view.columns)
+    count = 0
+    for row in view:
+        writer.writerow(row)
+        count += 1
+    return count
@@ -0,0 +1,249 @@
+"""
+Email templates with placeholders, conditionals and loops.
+
+    Dear {Name},
+    {% if Notes %}Note: {Notes}{% else %}No notes for this order.{% endif %}
+    {% for row in rows %}
+    - {loop.index}. PO {row.PO Number} arrives {row.ETA}
+    {% endfor %}
+
+{name} placeholders work exactly as in mail merge: unknown names are left in the
+text untouched and {{ / }} stand for literal braces. {a.b} looks up b in a (a key,
+attribute or index). {% if [not] name %} / {% else %} / {% endif %} and
+{% for item in name %} / {% endfor %} blocks may be nested; inside a loop
+{loop.index} counts from 1. A block tag on a line of its own removes that line.
+
+Templates are parsed once into a tree of closures and cached by their source
+text, so rendering the same template for thousands of rows only costs the
+lookups and the join. Templates read from disk are cached by path and mtime.
+"""
+
+import functools
+import os
+import re
+
+class TemplateError(ValueError):
+    """A template has an unknown or unbalanced {% %} tag."""
+
+# A tag alone on its line (swallowing the line), an inline tag, escaped braces, or a placeholder
+_TOKEN = re.compile(
+    r"^[ \t]*\{%(?P<line_tag>[^%\n]*)%\}[ \t]*(?:\r?\n|\Z)"
+    r"|\{%(?P<tag>[^%\n]*)%\}"
+    r"|(?P<escape>\{\{|\}\})"
+    r"|\{(?P<name>[^{}\n]+)\}",
+    re.MULTILINE,
+)
+_IF = re.compile(r"if\s+(not\s+)?(\S.*)$")
+_FOR = re.compile(r"for\s+(\w+)\s+in\s+(\S.*)$")
+
+_MISSING = object()
+
+# ------------------- Lookups -------------------
+
+def _resolve(context, path):
+    """Look up a dotted path like ('row', 'PO Number') in context; returns _MISSING when absent."""
+    value = context.get(path[0], _MISSING)
+    for key in path[1:]:
+        if value is _MISSING:
+            break
+        value = _step(value, key)
+    return value
+
+def _step(value, key):
+    getter = getattr(value, "get", None)
+    if getter is not None:
+        return getter(key, _MISSING)
+    if key.isdigit():
+        try:
+            return value[int(key)]
+        except (IndexError, TypeError):
+            return _MISSING
+    return getattr(value, key, _MISSING)
+
+def _to_text(value):
+    return "" if value is None else value if isinstance(value, str) else str(value)
+
+# ------------------- Compilation -------------------
+# Every node compiles to a function context -> str
+
+def _const(text):
+    return lambda context: text
+
+def _placeholder(name):
+    original = "{" + name + "}"
+    key = name.strip()
+    if "." not in key:
+        def render(context):
+            value = context.get(key, _MISSING)
+            return original if value is _MISSING else _to_text(value)
+        return render
+    path = tuple(part.strip() for part in key.split("."))
+    def render(context):
+        value = _resolve(context, path)
+        return original if value is _MISSING else _to_text(value)
+    return render
+
+def _sequence(parts):
+    """Combine node functions, folding adjacent constants together."""
+    folded = []
+    for part in parts:
+        if isinstance(part, str) and folded and isinstance(folded[-1], str):
+            folded[-1] += part
+        else:
+            folded.append(part)
+    if not folded:
+        return _const("")
+    if len(folded) == 1:
+        return _const(folded[0]) if isinstance(folded[0], str) else folded[0]
+    nodes = tuple(folded)
+    return lambda context: "".join([node if node.__class__ is str else node(context) for node in nodes])
+
+def _condition(negate, path, then, otherwise):
+    def render(context):
+        value = _resolve(context, path)
+        truthy = value is not _MISSING and bool(value)
+        return then(context) if truthy != negate else otherwise(context)
+    return render
+
+class _Loop:
+    """The loop variable available inside {% for %} blocks."""
+    __slots__ = ("index",)
+
+    def get(self, key, default=None):
+        return self.index if key == "index" else default
+
+def _loop(name, path, body):
+    def render(context):
+        items = _resolve(context, path)
+        if items is _MISSING or not items:
+            return ""
+        scope = dict(context)
+        loop = scope["loop"] = _Loop()
+        parts = []
+        for loop.index, item in enumerate(items, start=1):
+            scope[name] = item
+            parts.append(body(scope))
+        return "".join(parts)
+    return render
+
+def _line_number(source, position):
+    return source.count("\n", 0, position) + 1
+
+def _parse(source):
+    """Compile source into one render function."""
+    # Each open block is [kind, data, line, parts, else_parts or None]
+    stack = [["root", None, 1, [], None]]
+    position = 0
+    for match in _TOKEN.finditer(source):
+        parts = stack[-1][4] if stack[-1][4] is not None else stack[-1][3]
+        if match.start() > position:
+            parts.append(source[position:match.start()])
+        position = match.end()
+
+        if match.group("escape"):
+            parts.append(match.group("escape")[0])
+        elif match.group("name") is not None:
+            parts.append(_placeholder(match.group("name")))
+        else:
+            tag = (match.group("line_tag") if match.group("line_tag") is not None else match.group("tag")).strip()
+            line = _line_number(source, match.start())
+            _apply_tag(stack, tag, line)
+
+    block = stack[-1]
+    if len(stack) > 1:
+        raise TemplateError(f"Unclosed {{% {block[0]} %}} opened on line {block[2]}.")
+    if position < len(source):
+        block[3].append(source[position:])
+    return _sequence(block[3])
+
+def _apply_tag(stack, tag, line):
+    """Open, switch or close a block for one {% %} tag."""
+    if_match = _IF.match(tag)
+    for_match = _FOR.match(tag)
+    if if_match:
+        path = tuple(part.strip() for part in if_match.group(2).strip().split("."))
+        stack.append(["if", (bool(if_match.group(1)), path), line, [], None])
+    elif for_match:
+        path = tuple(part.strip() for part in for_match.group(2).strip().split("."))
+        stack.append(["for", (for_match.group(1), path), line, [], None])
+    elif tag == "else":
+        if stack[-1][0] != "if" or stack[-1][4] is not None:
+            raise TemplateError(f"Unexpected {{% else %}} on line {line}.")
+        stack[-1][4] = []
+    elif tag in ("endif", "endfor"):
+        kind, data, _, parts, else_parts = stack[-1]
+        if kind != tag[3:]:
+            raise TemplateError(f"Unexpected {{% {tag} %}} on line {line}.")
+        stack.pop()
+        if kind == "if":
+            node = _condition(data[0], data[1], _sequence(parts), _sequence(else_parts or []))
+        else:
+            node = _loop(data[0], data[1], _sequence(parts))
+        parent = stack[-1]
+        (parent[4] if parent[4] is not None else parent[3]).append(node)
+    else:
+        raise TemplateError(f"Unknown tag {{% {tag} %}} on line {line}.")
+
+# ------------------- Templates -------------------
+
+class Template:
+    """A compiled template; render() fills it from a mapping of values."""
+
+    __slots__ = ("source", "_render")
+
+    def __init__(self, source):
+        self.source = source
+        self._render = _parse(source) if "{" in source or "}}" in source else _const(source)
+
+    def render(self, context=None, **values):
+        """Render with context (a mapping, e.g. a row's column values) and/or keyword values."""
+        if values:
+            context = dict(context or {}, **values)
+        return self._render(context if context is not None else {})
+
+    def __repr__(self):
+        return f"Template({self.source[:40]!r})"
+
+@functools.lru_cache(maxsize=1024)
+def compile_template(source):
+    """
+    Return the compiled Template for source, reusing an earlier compilation of the same text.
+    Raises:
+        TemplateError: If a {% %} tag is unknown or unbalanced.
+    """
+    return Template(source)
+
+@functools.lru_cache(maxsize=256)
+def _load_template(path, mtime_ns, size):
+    with open(path, encoding="utf-8") as f:
+        return compile_template(f.read())
+
+def load_template(path):
+    """Read and compile a template file, re-reading it only when its mtime or size changes."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _load_template(path, stat.st_mtime_ns, stat.st_size)
+
+def render_template(source, context=None, **values):
+    """Compile (or reuse) source and render it once."""
+    return compile_template(source).render(context, **values)
+
+# ------------------- Table Context -------------------
+
+class RowDicts:
+    """Table rows presented as {column: value} mappings for {% for row in rows %} loops, built as iterated."""
+
+    def __init__(self, columns, rows):
+        self.columns = [str(col) for col in columns]
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        columns = self.columns
+        return (dict(zip(columns, row)) for row in self.rows)
+
+def table_context(columns, rows):
+    """Values describing a whole table: rows (as mappings), row_count and columns."""
+    return {"rows": RowDicts(columns, rows), "row_count": len(rows), "columns": ", ".join(map(str, columns))}